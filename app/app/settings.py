@@ -14,6 +14,8 @@ from pathlib import Path
 import os
 from glob import glob
 
+from django.core.exceptions import ImproperlyConfigured
+
 GDAL_LIBRARY_PATH=glob('/usr/lib/libgdal.so.*')[0]
 GEOS_LIBRARY_PATH=glob('/usr/lib/libgeos_c.so.*')[0]
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -53,6 +55,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -88,11 +91,68 @@ WSGI_APPLICATION = 'app.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.contrib.gis.db.backends.postgis',
+        'ENGINE': 'core.db.backends.postgis',
         'HOST': os.environ.get('DB_HOST'),
+        'PORT': os.environ.get('DB_PORT', ''),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        # Seconds a connection is reused across requests, 0 closes it at
+        # the end of each request
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        # Check a reused connection before the first query of a request
+        'CONN_HEALTH_CHECKS': os.environ.get(
+            'DB_CONN_HEALTH_CHECKS', 'true'
+        ).lower() == 'true',
+        # Required behind pgbouncer in transaction pooling mode
+        'DISABLE_SERVER_SIDE_CURSORS': os.environ.get(
+            'DB_DISABLE_SERVER_SIDE_CURSORS', 'false'
+        ).lower() == 'true',
+        'OPTIONS': {
+            'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+        },
+    }
+}
+
+# Read replicas, as comma separated host[:port], added as replica_1,
+# replica_2... with the settings of the primary. Read-only service area and
+# provider queries are spread over them by core.routers.ReplicaRouter.
+DATABASE_REPLICAS = []
+for index, address in enumerate(
+    filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), 1
+):
+    host, _, port = address.strip().partition(':')
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# Seconds a replica that failed to connect is skipped, and seconds the reads
+# of a provider go to the primary after they wrote, so they read their
+# writes despite the replication lag
+DB_REPLICA_COOLDOWN = int(os.environ.get('DB_REPLICA_COOLDOWN', 30))
+DB_REPLICA_STICKINESS = int(os.environ.get('DB_REPLICA_STICKINESS', 10))
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# Point CACHE_BACKEND to a shared backend (e.g. memcached or the database
+# cache) when running more than one worker, so invalidations reach all of
+# them.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
 
@@ -115,6 +175,35 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing: PASSWORD_HASHER ('argon2' or 'pbkdf2') hashes new
+# passwords, and passwords hashed otherwise, or with other costs, are
+# rehashed on login
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'argon2')
+PASSWORD_HASHERS = {
+    'argon2': [
+        'core.hashers.Argon2PasswordHasher',
+        'core.hashers.PBKDF2PasswordHasher',
+    ],
+    'pbkdf2': [
+        'core.hashers.PBKDF2PasswordHasher',
+        'core.hashers.Argon2PasswordHasher',
+    ],
+}[PASSWORD_HASHER]
+ARGON2_TIME_COST = int(os.environ.get('ARGON2_TIME_COST', 2))
+# KiB
+ARGON2_MEMORY_COST = int(os.environ.get('ARGON2_MEMORY_COST', 19456))
+ARGON2_PARALLELISM = int(os.environ.get('ARGON2_PARALLELISM', 1))
+PBKDF2_ITERATIONS = int(os.environ.get('PBKDF2_ITERATIONS', 260000))
+
+# Password hashes running at once per process, 0 for no limit. Past it,
+# requests wait at most PASSWORD_HASHING_TIMEOUT seconds, then get a 503.
+PASSWORD_HASHING_CONCURRENCY = int(
+    os.environ.get('PASSWORD_HASHING_CONCURRENCY', 0)
+)
+PASSWORD_HASHING_TIMEOUT = float(
+    os.environ.get('PASSWORD_HASHING_TIMEOUT', 0)
+)
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
@@ -148,7 +237,168 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'core.Provider'
 
+# Token authentication cache: entries, seconds an entry is trusted, and an
+# optional shared cache alias (e.g. 'default') backing the local one
+
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', 10000))
+TOKEN_CACHE_TTL = int(os.environ.get('TOKEN_CACHE_TTL', 30))
+TOKEN_CACHE_ALIAS = os.environ.get('TOKEN_CACHE_ALIAS', '')
+
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema'
 
-}
\ No newline at end of file
+}
+
+# Service area lookups
+
+# Answer point lookups from an in-process R-tree instead of PostGIS
+SERVICEAREA_SPATIAL_INDEX = os.environ.get(
+    'SERVICEAREA_SPATIAL_INDEX', 'false'
+).lower() == 'true'
+
+# Answer point lookups from the geohash cells covered by the service areas,
+# precomputed down to SERVICEAREA_GRID_PRECISION characters and at most
+# SERVICEAREA_GRID_MAX_CELLS cells per area
+SERVICEAREA_GRID_INDEX = os.environ.get(
+    'SERVICEAREA_GRID_INDEX', 'false'
+).lower() == 'true'
+SERVICEAREA_GRID_PRECISION = int(
+    os.environ.get('SERVICEAREA_GRID_PRECISION', 7)
+)
+# The cells are stored in a CharField(max_length=12)
+if not 1 <= SERVICEAREA_GRID_PRECISION <= 12:
+    raise ImproperlyConfigured(
+        'SERVICEAREA_GRID_PRECISION must be between 1 and 12.'
+    )
+SERVICEAREA_GRID_MAX_CELLS = int(
+    os.environ.get('SERVICEAREA_GRID_MAX_CELLS', 1024)
+)
+
+# Maximum number of points accepted by the batch lookup endpoint
+SERVICEAREA_BATCH_MAX_POINTS = int(
+    os.environ.get('SERVICEAREA_BATCH_MAX_POINTS', 1000)
+)
+
+# Default and maximum number of service areas per lookup page
+SERVICEAREA_PAGE_SIZE = int(os.environ.get('SERVICEAREA_PAGE_SIZE', 100))
+SERVICEAREA_MAX_PAGE_SIZE = int(
+    os.environ.get('SERVICEAREA_MAX_PAGE_SIZE', 1000)
+)
+
+# Maximum number of vertices of the pieces service areas are split into
+SERVICEAREA_SUBDIVIDE_MAX_VERTICES = int(
+    os.environ.get('SERVICEAREA_SUBDIVIDE_MAX_VERTICES', 64)
+)
+
+# Maximum number of vertices of a service area polygon
+SERVICEAREA_MAX_VERTICES = int(
+    os.environ.get('SERVICEAREA_MAX_VERTICES', 100000)
+)
+
+# Zoom levels of the simplified polygons stored for every service area
+SERVICEAREA_SIMPLIFY_ZOOMS = sorted(
+    int(zoom) for zoom in os.environ.get(
+        'SERVICEAREA_SIMPLIFY_ZOOMS', '4,8,12'
+    ).split(',') if zoom
+)
+
+# Cache lookup responses per geohash cell of SERVICEAREA_RESPONSE_CACHE_PRECISION
+# characters (9 is about 5m x 5m); points are looked up at their cell center
+SERVICEAREA_RESPONSE_CACHE = os.environ.get(
+    'SERVICEAREA_RESPONSE_CACHE', 'false'
+).lower() == 'true'
+SERVICEAREA_RESPONSE_CACHE_PRECISION = int(
+    os.environ.get('SERVICEAREA_RESPONSE_CACHE_PRECISION', 9)
+)
+SERVICEAREA_RESPONSE_CACHE_TIMEOUT = int(
+    os.environ.get('SERVICEAREA_RESPONSE_CACHE_TIMEOUT', 300)
+)
+# Seconds clients may reuse a lookup response without revalidating it
+SERVICEAREA_RESPONSE_CACHE_MAX_AGE = int(
+    os.environ.get('SERVICEAREA_RESPONSE_CACHE_MAX_AGE', 0)
+)
+
+# Maximum number of service areas returned by the nearest lookup, and
+# maximum distance in meters they are searched within
+SERVICEAREA_NEAREST_MAX = int(os.environ.get('SERVICEAREA_NEAREST_MAX', 20))
+SERVICEAREA_NEAREST_MAX_RADIUS = float(
+    os.environ.get('SERVICEAREA_NEAREST_MAX_RADIUS', 50000)
+)
+
+# Maximum number of creates, updates and deletes per bulk request
+SERVICEAREA_BULK_MAX_ITEMS = int(
+    os.environ.get('SERVICEAREA_BULK_MAX_ITEMS', 10000)
+)
+
+# Lookup throttling: token bucket per auth token and endpoint refilled at
+# SERVICEAREA_THROTTLE_RATE requests per second (0 disables it) up to
+# SERVICEAREA_THROTTLE_BURST, kept in a local LRU of
+# SERVICEAREA_THROTTLE_SIZE buckets, or in the SERVICEAREA_THROTTLE_CACHE
+# cache alias shared by the workers
+SERVICEAREA_THROTTLE_RATE = float(
+    os.environ.get('SERVICEAREA_THROTTLE_RATE', 0)
+)
+SERVICEAREA_THROTTLE_BURST = int(
+    os.environ.get('SERVICEAREA_THROTTLE_BURST', 20)
+)
+SERVICEAREA_THROTTLE_SIZE = int(
+    os.environ.get('SERVICEAREA_THROTTLE_SIZE', 10000)
+)
+SERVICEAREA_THROTTLE_CACHE = os.environ.get('SERVICEAREA_THROTTLE_CACHE', '')
+
+# Maximum number of lookups running at once per process, beyond which they
+# are answered with a 503 (0 disables it)
+SERVICEAREA_MAX_IN_FLIGHT = int(
+    os.environ.get('SERVICEAREA_MAX_IN_FLIGHT', 0)
+)
+
+# Maximum number of async lookups running database work at once per process
+SERVICEAREA_ASYNC_MAX_CONCURRENCY = int(
+    os.environ.get('SERVICEAREA_ASYNC_MAX_CONCURRENCY', 32)
+)
+
+# Decimal digits of the coordinates of the GeoJSON polygons returned
+SERVICEAREA_GEOJSON_PRECISION = int(
+    os.environ.get('SERVICEAREA_GEOJSON_PRECISION', 6)
+)
+
+# Vector tiles: deepest zoom level served, lifetime in seconds of the cached
+# tiles, and number of tiles per zoom level evicted one by one when a
+# service area changes before the whole level is invalidated instead
+SERVICEAREA_TILE_MAX_ZOOM = int(
+    os.environ.get('SERVICEAREA_TILE_MAX_ZOOM', 18)
+)
+SERVICEAREA_TILE_CACHE_TIMEOUT = int(
+    os.environ.get('SERVICEAREA_TILE_CACHE_TIMEOUT', 86400)
+)
+SERVICEAREA_TILE_INVALIDATE_MAX = int(
+    os.environ.get('SERVICEAREA_TILE_INVALIDATE_MAX', 64)
+)
+# Seconds clients may reuse a tile without asking again
+SERVICEAREA_TILE_MAX_AGE = int(
+    os.environ.get('SERVICEAREA_TILE_MAX_AGE', 0)
+)
+
+# Record request timings and query counts as Prometheus metrics served at
+# /metrics, and, when SERVER_TIMING is on, report them in Server-Timing
+# response headers
+INSTRUMENTATION = os.environ.get(
+    'INSTRUMENTATION', 'true'
+).lower() == 'true'
+SERVER_TIMING = os.environ.get('SERVER_TIMING', 'false').lower() == 'true'
+# Comma separated networks allowed to read /metrics, besides staff users
+METRICS_ALLOWED_NETWORKS = [
+    network.strip() for network in os.environ.get(
+        'METRICS_ALLOWED_NETWORKS', '127.0.0.1/32,::1/128'
+    ).split(',') if network.strip()
+]
+
+# Store the plans (EXPLAIN ANALYZE) of the SELECT queries of a sample of
+# the requests slower than SLOW_QUERY_THRESHOLD milliseconds, at most
+# SLOW_QUERY_MAX_PLANS per request. Requires INSTRUMENTATION.
+SLOW_QUERY_CAPTURE = os.environ.get(
+    'SLOW_QUERY_CAPTURE', 'false'
+).lower() == 'true'
+SLOW_QUERY_THRESHOLD = float(os.environ.get('SLOW_QUERY_THRESHOLD', 500))
+SLOW_QUERY_SAMPLE_RATE = float(os.environ.get('SLOW_QUERY_SAMPLE_RATE', 0.1))
+SLOW_QUERY_MAX_PLANS = int(os.environ.get('SLOW_QUERY_MAX_PLANS', 3))
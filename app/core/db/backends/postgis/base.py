@@ -0,0 +1,44 @@
+"""
+PostGIS backend with health checks of persistent connections
+"""
+from django.contrib.gis.db.backends.postgis.base import (
+    DatabaseWrapper as PostGISDatabaseWrapper,
+)
+
+
+class DatabaseWrapper(PostGISDatabaseWrapper):
+    """
+    PostGIS backend that, when CONN_HEALTH_CHECKS is set, checks a reused
+    connection is still usable before the first query of each request
+    instead of failing that request
+    """
+    health_check_done = False
+
+    def connect(self):
+        """
+        A new connection doesn't need checking
+        """
+        super().connect()
+        self.health_check_done = True
+
+    def close_if_unusable_or_obsolete(self):
+        """
+        Called at the start and end of every request
+        """
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def _cursor(self, name=None):
+        """
+        Check the connection before its first use in the request
+        """
+        if (
+            self.connection is not None
+            and not self.health_check_done
+            and self.settings_dict.get('CONN_HEALTH_CHECKS')
+            and not self.in_atomic_block
+        ):
+            self.health_check_done = True
+            if not self.is_usable():
+                self.close()
+        return super()._cursor(name)
@@ -0,0 +1,67 @@
+"""
+Geohash encoding of coordinates
+"""
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode(latitude, longitude, precision):
+    """
+    Return the geohash of the point with the given number of characters
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(geohash) < precision:
+        value, value_range = (
+            (longitude, lng_range) if even else (latitude, lat_range)
+        )
+        middle = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            value_range[0] = middle
+        else:
+            value_range[1] = middle
+        even = not even
+
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(geohash)
+
+
+def bounds(geohash):
+    """
+    Return the (min_lat, min_lng, max_lat, max_lng) of the geohash cell
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+
+    for char in geohash:
+        bits = BASE32.index(char)
+        for shift in range(4, -1, -1):
+            value_range = lng_range if even else lat_range
+            middle = (value_range[0] + value_range[1]) / 2
+            if bits >> shift & 1:
+                value_range[0] = middle
+            else:
+                value_range[1] = middle
+            even = not even
+
+    return (lat_range[0], lng_range[0], lat_range[1], lng_range[1])
+
+
+def center(geohash):
+    """
+    Return the (latitude, longitude) of the center of the geohash cell
+    """
+    min_lat, min_lng, max_lat, max_lng = bounds(geohash)
+    return ((min_lat + max_lat) / 2, (min_lng + max_lng) / 2)
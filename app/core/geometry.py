@@ -0,0 +1,134 @@
+"""
+Validation and normalization of the service area polygons written, and
+their geohash cell coverage
+"""
+import math
+import os
+from collections import deque
+
+from django.conf import settings
+from django.contrib.gis.geos import Polygon
+
+from core import geohash
+
+
+# Relative area change tolerated when repairing an invalid polygon
+REPAIR_AREA_TOLERANCE = 1e-6
+
+
+def signed_area(ring):
+    """
+    Return the shoelace area of a closed ring, positive when it is
+    counterclockwise
+    """
+    return sum(
+        x0 * y1 - x1 * y0
+        for (x0, y0), (x1, y1) in zip(ring, ring[1:])
+    ) / 2
+
+
+def clean_ring(coords):
+    """
+    Return the ring as closed (x, y) tuples without repeated consecutive
+    vertices
+    """
+    ring = []
+    for coord in coords:
+        x, y = float(coord[0]), float(coord[1])
+        if not (math.isfinite(x) and math.isfinite(y)):
+            raise ValueError('Polygon coordinates must be finite numbers')
+        if not ring or ring[-1] != (x, y):
+            ring.append((x, y))
+    if ring and ring[0] != ring[-1]:
+        ring.append(ring[0])
+    if len(ring) < 4:
+        raise ValueError('Polygon rings need at least 3 distinct vertices')
+    return ring
+
+
+def build_polygon(rings, srid=4326):
+    """
+    Build a valid Polygon from its exterior ring and holes, given as
+    sequences of (x, y) coordinates.
+    Repeated vertices are dropped, the rings are closed and oriented
+    (exterior counterclockwise, holes clockwise). An invalid polygon is
+    repaired only when that keeps its area, so a bow tie is rejected
+    rather than cut in half. Raises ValueError when it can't be fixed.
+    """
+    if not rings:
+        raise ValueError('Polygon has no exterior ring')
+
+    rings = [clean_ring(ring) for ring in rings]
+    vertex_count = sum(len(ring) for ring in rings)
+    if vertex_count > settings.SERVICEAREA_MAX_VERTICES:
+        raise ValueError(
+            f'Polygon has {vertex_count} vertices, more than the '
+            f'{settings.SERVICEAREA_MAX_VERTICES} allowed'
+        )
+
+    areas = [signed_area(ring) for ring in rings]
+    rings = [
+        ring if (area > 0) == (index == 0) else ring[::-1]
+        for index, (ring, area) in enumerate(zip(rings, areas))
+    ]
+    polygon = Polygon(*rings, srid=srid)
+    if polygon.valid:
+        return polygon
+
+    reason = polygon.valid_reason
+    expected_area = abs(areas[0]) - sum(abs(area) for area in areas[1:])
+    repaired = polygon.buffer(0)
+    if (
+        isinstance(repaired, Polygon)
+        and not repaired.empty
+        and repaired.valid
+        and abs(repaired.area - expected_area)
+        <= REPAIR_AREA_TOLERANCE * abs(expected_area)
+    ):
+        return normalize_polygon(repaired)
+    raise ValueError(f'Invalid polygon: {reason}')
+
+
+def normalize_polygon(polygon):
+    """
+    Return a valid and normalized copy of the polygon, see build_polygon
+    """
+    if not isinstance(polygon, Polygon):
+        raise ValueError(f'Expected a Polygon, got a {polygon.geom_type}')
+    return build_polygon(polygon.coords, srid=polygon.srid or 4326)
+
+
+def geohash_cover(polygon, precision, max_cells):
+    """
+    Return {cell: full} of the geohash cells intersecting the polygon,
+    full when the polygon covers the whole cell. Cells on the boundary are
+    split into their 32 children down to `precision` characters, coarsest
+    first, until `max_cells` cells would be exceeded.
+    """
+    prepared = polygon.prepared
+    min_lng, min_lat, max_lng, max_lat = polygon.extent
+    # The cell of the common prefix of two corners contains the whole box
+    start = os.path.commonprefix([
+        geohash.encode(min_lat, min_lng, precision),
+        geohash.encode(max_lat, max_lng, precision),
+    ])
+    pending = deque([start] if start else geohash.BASE32)
+
+    cells = {}
+    while pending:
+        cell = pending.popleft()
+        cell_min_lat, cell_min_lng, cell_max_lat, cell_max_lng = \
+            geohash.bounds(cell)
+        box = Polygon.from_bbox(
+            (cell_min_lng, cell_min_lat, cell_max_lng, cell_max_lat)
+        )
+        if not prepared.intersects(box):
+            continue
+        if prepared.covers(box):
+            cells[cell] = True
+        elif len(cell) >= precision \
+                or len(cells) + len(pending) + 32 > max_cells:
+            cells[cell] = False
+        else:
+            pending.extend(cell + char for char in geohash.BASE32)
+    return cells
@@ -0,0 +1,105 @@
+"""
+Password hashers whose cost is tuned through the settings, with a bound on
+the hashes running at once
+"""
+import threading
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class HashingBusy(Exception):
+    """
+    Raised when too many passwords are being hashed
+    """
+
+
+class HashingLimiter:
+    """
+    Bound the password hashes running at once in the process to
+    PASSWORD_HASHING_CONCURRENCY, so bursts of logins can't take all the
+    CPU of the request workers. The hashes still run in the request
+    thread: past the limit, requests wait at most PASSWORD_HASHING_TIMEOUT
+    seconds for a slot, then HashingBusy is raised.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.limit = None
+        self.slots = None
+        self.local = threading.local()
+
+    def get_slots(self):
+        """
+        Return the semaphore of the current limit, once the settings are
+        loaded
+        """
+        with self.lock:
+            if self.limit != settings.PASSWORD_HASHING_CONCURRENCY:
+                self.limit = settings.PASSWORD_HASHING_CONCURRENCY
+                self.slots = threading.BoundedSemaphore(self.limit)
+            return self.slots
+
+    def run(self, func, *args, **kwargs):
+        """
+        Return func(*args, **kwargs), counted as a hash when limited
+        """
+        if not settings.PASSWORD_HASHING_CONCURRENCY \
+                or getattr(self.local, 'hashing', False):
+            return func(*args, **kwargs)
+
+        slots = self.get_slots()
+        if not slots.acquire(timeout=settings.PASSWORD_HASHING_TIMEOUT):
+            raise HashingBusy
+        self.local.hashing = True
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.local.hashing = False
+            slots.release()
+
+
+hashing_limiter = HashingLimiter()
+
+
+class LimitedHasherMixin:
+    """
+    Count the hashing of a password hasher in the hashing limit
+    """
+
+    def encode(self, *args, **kwargs):
+        return hashing_limiter.run(super().encode, *args, **kwargs)
+
+    def verify(self, password, encoded):
+        return hashing_limiter.run(super().verify, password, encoded)
+
+
+class Argon2PasswordHasher(LimitedHasherMixin, hashers.Argon2PasswordHasher):
+    """
+    Argon2 hasher using the ARGON2_* costs. Passwords hashed with other
+    costs are rehashed on login.
+    """
+
+    @property
+    def time_cost(self):
+        return settings.ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.ARGON2_PARALLELISM
+
+
+class PBKDF2PasswordHasher(LimitedHasherMixin,
+                           hashers.PBKDF2PasswordHasher):
+    """
+    PBKDF2 hasher using PBKDF2_ITERATIONS. Passwords hashed with other
+    iterations are rehashed on login.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PBKDF2_ITERATIONS
@@ -0,0 +1,118 @@
+"""
+Per request timings and query counts, exported as Prometheus metrics
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from prometheus_client import Counter, Histogram
+
+
+REQUESTS = Counter(
+    'http_requests',
+    'HTTP requests handled',
+    ['endpoint', 'method', 'status']
+)
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds',
+    'Duration of the HTTP requests',
+    ['endpoint', 'method']
+)
+PHASE_DURATION = Counter(
+    'http_request_phase_seconds',
+    'Time spent in each phase of the HTTP requests',
+    ['endpoint', 'phase']
+)
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries',
+    'SQL queries run per HTTP request',
+    ['endpoint'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, float('inf'))
+)
+
+# Metrics of the request being handled, if any
+current_metrics = contextvars.ContextVar('current_metrics', default=None)
+
+
+class RequestMetrics:
+    """
+    Timings of the phases and SQL queries of a request
+    """
+    __slots__ = ('started', 'phases', 'queries', 'statements')
+
+    def __init__(self, keep_statements=False):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.queries = 0
+        # (sql, params, many, seconds, database alias) of every query, when
+        # kept
+        self.statements = [] if keep_statements else None
+
+    def add(self, phase, seconds):
+        """
+        Add time spent in a phase
+        """
+        self.phases[phase] = self.phases.get(phase, 0) + seconds
+
+
+@contextmanager
+def timer(phase):
+    """
+    Time the block as a phase of the current request
+    """
+    metrics = current_metrics.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(phase, time.perf_counter() - started)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper counting and timing the queries of the
+    current request
+    """
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.queries += 1
+        metrics.add('db', elapsed)
+        if metrics.statements is not None:
+            metrics.statements.append(
+                (sql, params, many, elapsed, context['connection'].alias)
+            )
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    """
+    Record the queries of every database connection, whichever thread
+    opens it
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class InstrumentedViewMixin:
+    """
+    API view mixin timing the authentication of the requests
+    """
+
+    def perform_authentication(self, request):
+        """
+        Authenticate the request, timed as the `auth` phase
+        """
+        with timer('auth'):
+            super().perform_authentication(request)
@@ -0,0 +1,45 @@
+"""
+This command will rebuild the geometry derived from the service areas.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import ServiceArea
+
+
+class Command(BaseCommand):
+    """Rebuild the bounding boxes, pieces, cells and simplified polygons"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of service areas processed per batch',
+        )
+
+    def handle(self, *args, **options):
+        """ Entrypoint for command. """
+        batch_size = options['batch_size']
+        ids = list(
+            ServiceArea.objects.order_by('id').values_list('id', flat=True)
+        )
+        self.stdout.write(f'Backfilling {len(ids)} service areas...')
+
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            with transaction.atomic():
+                service_areas = list(
+                    ServiceArea.objects.filter(id__in=batch)
+                    .only('id', 'polygon')
+                )
+                for service_area in service_areas:
+                    service_area.set_derived_fields()
+                ServiceArea.objects.bulk_update(
+                    service_areas, ServiceArea.DERIVED_FIELDS
+                )
+                ServiceArea.objects.filter(id__in=batch) \
+                    .refresh_derived_geometry()
+            self.stdout.write(f'{start + len(batch)}/{len(ids)}')
+
+        self.stdout.write(self.style.SUCCESS('Service areas backfilled!'))
@@ -0,0 +1,277 @@
+"""
+This command will benchmark the service area API against the database.
+"""
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import Polygon
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection, connections
+from django.db.backends.signals import connection_created
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import ServiceArea
+
+
+EMAIL_DOMAIN = 'benchmark.invalid'
+
+
+def percentile(values, pct):
+    """Return the nearest-rank percentile of sorted values"""
+    if not values:
+        return 0.0
+    return values[max(math.ceil(pct / 100 * len(values)) - 1, 0)]
+
+
+class Command(BaseCommand):
+    """Seed service areas and measure the latency of the service area API"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--providers', type=int, default=10,
+            help='Number of providers to seed',
+        )
+        parser.add_argument(
+            '--areas', type=int, default=1000,
+            help='Number of service areas to seed',
+        )
+        parser.add_argument(
+            '--vertices', type=int, default=32,
+            help='Number of vertices of each seeded polygon',
+        )
+        parser.add_argument(
+            '--lookups', type=int, default=2000,
+            help='Number of point lookups to run',
+        )
+        parser.add_argument(
+            '--writes', type=int, default=100,
+            help='Number of creates and of updates to run',
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=8,
+            help='Number of requests in flight',
+        )
+        parser.add_argument(
+            '--extent', type=float, default=1.0,
+            help='Half width in degrees of the region around (0, 0)',
+        )
+        parser.add_argument(
+            '--keep-connections', action='store_true',
+            help='Keep database connections open regardless of CONN_MAX_AGE',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Keep the seeded data after the run',
+        )
+
+    def random_polygon(self, vertices):
+        """Return a random regular polygon inside the region"""
+        extent = self.options['extent']
+        radius = self.random.uniform(extent / 50, extent / 5)
+        cx = self.random.uniform(-extent, extent)
+        cy = self.random.uniform(-extent, extent)
+        ring = [
+            (
+                cx + radius * math.cos(2 * math.pi * i / vertices),
+                cy + radius * math.sin(2 * math.pi * i / vertices),
+            )
+            for i in range(vertices)
+        ]
+        return Polygon(ring + ring[:1], srid=4326)
+
+    def random_point(self):
+        """Return a random (latitude, longitude) inside the region"""
+        extent = self.options['extent']
+        return (
+            self.random.uniform(-extent, extent),
+            self.random.uniform(-extent, extent),
+        )
+
+    def cleanup(self):
+        """Delete the data seeded by previous runs"""
+        get_user_model().objects.filter(
+            email__endswith=f'@{EMAIL_DOMAIN}'
+        ).delete()
+
+    def seed(self):
+        """Seed the providers, their tokens and their service areas"""
+        providers = [
+            get_user_model().objects.create_user(
+                email=f'provider{i}@{EMAIL_DOMAIN}',
+                password='benchmark',
+                name=f'Benchmark provider {i}',
+            )
+            for i in range(self.options['providers'])
+        ]
+        tokens = [Token.objects.create(user=p).key for p in providers]
+
+        ServiceArea.objects.bulk_create_areas(
+            [
+                ServiceArea(
+                    provider=self.random.choice(providers),
+                    name=f'Benchmark area {i}',
+                    description='Benchmark',
+                    price=Decimal(self.random.randint(100, 10000)) / 100,
+                    polygon=self.random_polygon(self.options['vertices']),
+                )
+                for i in range(self.options['areas'])
+            ],
+            batch_size=1000
+        )
+        return providers, tokens
+
+    def connection_opened(self, **kwargs):
+        """Count the database connections opened during the run"""
+        with self.lock:
+            self.connections += 1
+
+    def timed_request(self, token, method, url, data=None):
+        """Send a request and return (seconds, query count, status)"""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            # The test client keeps connections open, so apply CONN_MAX_AGE
+            # as a WSGI server would at the start and end of the request
+            if self.emulate_server:
+                close_old_connections()
+            if method == 'get':
+                response = client.get(url, data)
+            else:
+                response = getattr(client, method)(url, data, format='json')
+            if self.emulate_server:
+                close_old_connections()
+            elapsed = time.perf_counter() - started
+        return elapsed, len(queries), response.status_code
+
+    def run_requests(self, name, requests):
+        """Run the (token, method, url, data) requests and report them"""
+        if not requests:
+            return
+        concurrency = self.options['concurrency']
+        pending = iter(requests)
+        results = []
+
+        def worker():
+            # Every worker thread runs requests until none is left, then
+            # closes its own connections, which can't be shared with the
+            # main thread
+            try:
+                while True:
+                    with self.lock:
+                        request = next(pending, None)
+                    if request is None:
+                        return
+                    result = self.timed_request(*request)
+                    with self.lock:
+                        results.append(result)
+            finally:
+                connections.close_all()
+
+        self.connections = 0
+        started = time.perf_counter()
+        if concurrency > 1:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                workers = [
+                    executor.submit(worker) for _ in range(concurrency)
+                ]
+                for future in workers:
+                    future.result()
+        else:
+            results = [self.timed_request(*request) for request in requests]
+        wall = time.perf_counter() - started
+
+        latencies = sorted(result[0] * 1000 for result in results)
+        queries = sum(result[1] for result in results) / len(results)
+        errors = sum(1 for result in results if result[2] >= 400)
+        self.stdout.write(
+            f'{name:<8} {len(results):>7} {len(results) / wall:>9.1f} '
+            f'{percentile(latencies, 50):>8.2f} '
+            f'{percentile(latencies, 95):>8.2f} '
+            f'{percentile(latencies, 99):>8.2f} '
+            f'{queries:>8.2f} {self.connections / len(results):>9.2f} '
+            f'{errors:>6}'
+        )
+
+    def handle(self, *args, **options):
+        """ Entrypoint for command. """
+        self.options = options
+        self.random = random.Random(options['seed'])
+        self.emulate_server = not options['keep_connections']
+        self.lock = threading.Lock()
+        self.connections = 0
+
+        self.cleanup()
+        self.stdout.write(
+            f'Seeding {options["providers"]} providers and '
+            f'{options["areas"]} areas of {options["vertices"]} vertices...'
+        )
+        providers, tokens = self.seed()
+
+        try:
+            self.benchmark(providers, tokens)
+        finally:
+            if not options['keep']:
+                self.cleanup()
+
+    def benchmark(self, providers, tokens):
+        """Run the lookup, create and update scenarios"""
+        list_url = reverse('servicearea:servicearea-list')
+        lookups = []
+        for _ in range(self.options['lookups']):
+            latitude, longitude = self.random_point()
+            lookups.append((
+                self.random.choice(tokens), 'get', list_url,
+                {'latitude': latitude, 'longitude': longitude},
+            ))
+
+        creates = []
+        for i in range(self.options['writes']):
+            polygon = self.random_polygon(self.options['vertices'])
+            creates.append((
+                self.random.choice(tokens), 'post', list_url,
+                {
+                    'name': f'Benchmark created area {i}',
+                    'price': '10.00',
+                    'polygon': [
+                        {'lat': y, 'lng': x} for x, y in polygon.coords[0]
+                    ],
+                },
+            ))
+
+        token_by_provider = dict(zip((p.id for p in providers), tokens))
+        areas = list(
+            ServiceArea.objects.filter(provider__in=providers)
+            .values_list('id', 'provider_id')[:self.options['writes']]
+        )
+        updates = [
+            (
+                token_by_provider[provider_id], 'patch',
+                reverse('servicearea:servicearea-detail', args=[pk]),
+                {'price': f'{self.random.randint(100, 10000) / 100:.2f}'},
+            )
+            for pk, provider_id in areas
+        ]
+
+        self.stdout.write(
+            f'{"scenario":<8} {"requests":>7} {"req/s":>9} {"p50 ms":>8} '
+            f'{"p95 ms":>8} {"p99 ms":>8} {"queries":>8} {"conn/req":>9} '
+            f'{"errors":>6}'
+        )
+        connection_created.connect(self.connection_opened)
+        try:
+            self.run_requests('lookup', lookups)
+            self.run_requests('create', creates)
+            self.run_requests('update', updates)
+        finally:
+            connection_created.disconnect(self.connection_opened)
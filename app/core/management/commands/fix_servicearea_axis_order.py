@@ -0,0 +1,99 @@
+"""
+This command will swap the axes of service areas stored as
+(latitude, longitude) instead of (longitude, latitude).
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.models import ServiceArea
+from core.signals import service_areas_bulk_changed
+
+
+class Command(BaseCommand):
+    """
+    Swap the coordinates of the selected service areas. Running it twice
+    on the same areas swaps them back, so select only the affected ones.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ids', type=int, nargs='+',
+            help='Ids of the service areas to fix',
+        )
+        parser.add_argument(
+            '--provider',
+            help='Email of the provider whose service areas to fix',
+        )
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Fix every service area',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report the service areas that would be fixed',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of service areas fixed per transaction',
+        )
+
+    def handle(self, *args, **options):
+        """ Entrypoint for command. """
+        if not (options['ids'] or options['provider'] or options['all']):
+            raise CommandError(
+                'Select the service areas with --ids, --provider or --all'
+            )
+
+        queryset = ServiceArea.objects.order_by('id')
+        if options['ids']:
+            queryset = queryset.filter(id__in=options['ids'])
+        if options['provider']:
+            queryset = queryset.filter(provider__email=options['provider'])
+        ids = list(queryset.values_list('id', flat=True))
+
+        if options['dry_run']:
+            self.stdout.write(f'{len(ids)} service areas would be fixed')
+            for pk, *extent in queryset.values_list(
+                'id', 'min_lng', 'min_lat', 'max_lng', 'max_lat'
+            )[:10]:
+                min_x, min_y, max_x, max_y = extent
+                self.stdout.write(
+                    f'#{pk}: extent {tuple(extent)} -> '
+                    f'{(min_y, min_x, max_y, max_x)}'
+                )
+            return
+
+        batch_size = options['batch_size']
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            with transaction.atomic():
+                self.fix(batch)
+            self.stdout.write(f'{start + len(batch)}/{len(ids)}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Fixed {len(ids)} service areas'
+        ))
+
+    def fix(self, ids):
+        """Swap the axes of the service areas and rebuild what derives"""
+        with connection.cursor() as cursor:
+            # Swapping the axes mirrors the rings, so orient them again
+            cursor.execute(
+                f"""
+                UPDATE {ServiceArea._meta.db_table}
+                SET polygon = ST_ForcePolygonCCW(ST_FlipCoordinates(polygon))
+                WHERE id = ANY(%s)
+                """,
+                [ids]
+            )
+
+        service_areas = list(
+            ServiceArea.objects.filter(id__in=ids).only('id', 'polygon')
+        )
+        for service_area in service_areas:
+            service_area.set_derived_fields()
+        ServiceArea.objects.bulk_update(
+            service_areas, ServiceArea.DERIVED_FIELDS
+        )
+        ServiceArea.objects.filter(id__in=ids).refresh_derived_geometry()
+        service_areas_bulk_changed.send(sender=ServiceArea, ids=ids)
@@ -0,0 +1,220 @@
+"""
+This command will import service areas from a GeoJSON or CSV file.
+"""
+import csv
+import json
+import re
+import sys
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import GEOSGeometry, GEOSException
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.geometry import normalize_polygon
+from core.models import ServiceArea
+
+
+FEATURES_START = re.compile(r'"features"\s*:\s*\[')
+FEATURE_SEPARATOR = re.compile(r'[\s,]*')
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_geojson_features(stream):
+    """
+    Yield the features of a GeoJSON FeatureCollection one at a time,
+    only keeping the feature being decoded in memory
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    eof = False
+
+    def read(size=CHUNK_SIZE):
+        chunk = stream.read(size)
+        return chunk, not chunk
+
+    while True:
+        match = FEATURES_START.search(buffer)
+        if match:
+            buffer = buffer[match.end():]
+            break
+        if eof:
+            raise CommandError('The file is not a FeatureCollection')
+        # Keep a tail in case the key is split between two chunks
+        chunk, eof = read()
+        buffer = buffer[-32:] + chunk
+
+    # Decode the features in place from `position`, only dropping the
+    # decoded ones from the buffer when reading more
+    position = 0
+    while True:
+        position = FEATURE_SEPARATOR.match(buffer, position).end()
+        if buffer.startswith(']', position):
+            return
+        if position < len(buffer):
+            try:
+                feature, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                pass
+            else:
+                yield feature
+                continue
+        if eof:
+            raise CommandError('Unexpected end of the GeoJSON file')
+        buffer = buffer[position:]
+        position = 0
+        # Read at least as much as the partial feature, so a feature
+        # spanning many chunks is decoded again a logarithmic number of
+        # times
+        chunk, eof = read(max(CHUNK_SIZE, len(buffer)))
+        buffer += chunk
+
+
+def iter_geojson_rows(stream):
+    """
+    Yield (properties, polygon) from a GeoJSON FeatureCollection
+    """
+    for feature in iter_geojson_features(stream):
+        geometry = feature.get('geometry')
+        if geometry is None:
+            raise ValueError('Feature without a geometry')
+        yield feature.get('properties') or {}, GEOSGeometry(
+            json.dumps(geometry)
+        )
+
+
+def iter_csv_rows(stream):
+    """
+    Yield (properties, polygon) from a CSV file with a `wkt` column
+    """
+    csv.field_size_limit(sys.maxsize)
+    for row in csv.DictReader(stream):
+        wkt = row.pop('wkt', None)
+        if not wkt:
+            raise ValueError('Row without a wkt column')
+        yield row, GEOSGeometry(wkt)
+
+
+class Command(BaseCommand):
+    """Import service areas in batches"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='GeoJSON or CSV file to import')
+        parser.add_argument(
+            '--format',
+            choices=('geojson', 'csv'),
+            help='Format of the file, guessed from its extension by default',
+        )
+        parser.add_argument(
+            '--provider',
+            help='Email of the provider of the areas without a provider',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of service areas inserted per query',
+        )
+
+    def get_provider(self, email):
+        """Return the provider with the email, caching the lookups"""
+        if email not in self.providers:
+            try:
+                self.providers[email] = get_user_model().objects.get(
+                    email=email
+                )
+            except get_user_model().DoesNotExist:
+                raise ValueError(f'Unknown provider {email}')
+        return self.providers[email]
+
+    def build_service_area(self, properties, polygon, default_provider):
+        """Validate a row and return its unsaved service area"""
+        polygon = normalize_polygon(polygon)
+
+        email = properties.get('provider') or default_provider
+        if not email:
+            raise ValueError('No provider given')
+
+        try:
+            price = Decimal(str(properties.get('price')))
+        except InvalidOperation:
+            raise ValueError(f'Invalid price {properties.get("price")}')
+
+        name = properties.get('name') or ''
+        # bulk_create doesn't run the validators of the fields
+        for field, value in (('name', name), ('price', price)):
+            try:
+                ServiceArea._meta.get_field(field).run_validators(value)
+            except ValidationError as error:
+                raise ValueError(
+                    f'Invalid {field}: {" ".join(error.messages)}'
+                )
+
+        return ServiceArea(
+            provider=self.get_provider(email),
+            name=name,
+            description=properties.get('description') or '',
+            price=price,
+            polygon=polygon,
+        )
+
+    def handle(self, *args, **options):
+        """ Entrypoint for command. """
+        path = options['path']
+        file_format = options['format'] or (
+            'csv' if path.lower().endswith('.csv') else 'geojson'
+        )
+        iter_rows = iter_csv_rows if file_format == 'csv' else \
+            iter_geojson_rows
+        batch_size = options['batch_size']
+        self.providers = {}
+
+        started = time.monotonic()
+        imported = 0
+        batch = []
+        with open(path, newline='') as stream, transaction.atomic():
+            rows = iter_rows(stream)
+            row_number = 0
+            while True:
+                row_number += 1
+                properties = {}
+                try:
+                    properties, polygon = next(rows)
+                    batch.append(self.build_service_area(
+                        properties, polygon, options['provider']
+                    ))
+                except StopIteration:
+                    break
+                except (ValueError, GEOSException) as error:
+                    label = f'Row {row_number}'
+                    name = str(properties.get('name') or '')[:40]
+                    if name:
+                        label += f' ({name})'
+                    raise CommandError(f'{label}: {error}')
+
+                if len(batch) >= batch_size:
+                    imported += self.insert(batch, started, imported)
+                    batch = []
+
+            if batch:
+                imported += self.insert(batch, started, imported)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} service areas in {elapsed:.1f}s '
+            f'({imported / max(elapsed, 1e-9):.0f}/s)'
+        ))
+
+    def insert(self, batch, started, imported):
+        """Insert a batch and report the throughput so far"""
+        ServiceArea.objects.bulk_create_areas(batch)
+        imported += len(batch)
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'{imported} service areas imported '
+            f'({imported / max(elapsed, 1e-9):.0f}/s)'
+        )
+        return len(batch)
@@ -0,0 +1,35 @@
+"""
+This command will rebuild the geohash cells covered by the service areas.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import ServiceArea
+
+
+class Command(BaseCommand):
+    """Rebuild the geohash cells of every service area"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of service areas processed per batch',
+        )
+
+    def handle(self, *args, **options):
+        """ Entrypoint for command. """
+        batch_size = options['batch_size']
+        ids = list(
+            ServiceArea.objects.order_by('id').values_list('id', flat=True)
+        )
+        self.stdout.write(f'Rebuilding the cells of {len(ids)} areas...')
+
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            with transaction.atomic():
+                ServiceArea.objects.filter(id__in=batch).refresh_cells()
+            self.stdout.write(f'{start + len(batch)}/{len(ids)}')
+
+        self.stdout.write(self.style.SUCCESS('Service area cells rebuilt!'))
@@ -0,0 +1,82 @@
+"""
+This command will summarize the query plans captured in slow requests.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Avg, Count, Max
+from django.utils import timezone
+
+from core.models import QueryPlan
+
+
+class Command(BaseCommand):
+    """Report the slowest captured queries and how they were planned"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=float, default=24,
+            help='Only report the plans captured in the last hours',
+        )
+        parser.add_argument(
+            '--limit', type=int, default=10,
+            help='Number of queries reported',
+        )
+        parser.add_argument(
+            '--endpoint',
+            help='Only report the queries of this endpoint',
+        )
+        parser.add_argument(
+            '--purge', action='store_true',
+            help='Delete the plans older than --hours instead',
+        )
+
+    def handle(self, *args, **options):
+        """ Entrypoint for command. """
+        since = timezone.now() - timedelta(hours=options['hours'])
+        if options['purge']:
+            deleted, _ = QueryPlan.objects.filter(
+                created_at__lt=since
+            ).delete()
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} plans'))
+            return
+
+        plans = QueryPlan.objects.filter(created_at__gte=since)
+        if options['endpoint']:
+            plans = plans.filter(endpoint=options['endpoint'])
+
+        worst = (
+            plans.values('fingerprint')
+            .annotate(
+                count=Count('id'),
+                avg_duration=Avg('duration'),
+                max_duration=Max('duration'),
+            )
+            .order_by('-max_duration')[:options['limit']]
+        )
+        if not worst:
+            self.stdout.write('No slow queries captured')
+            return
+
+        for rank, group in enumerate(worst, 1):
+            plan = plans.filter(
+                fingerprint=group['fingerprint']
+            ).order_by('-duration').first()
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'#{rank} {plan.endpoint}: {group["count"]} captured, '
+                f'avg {group["avg_duration"]:.1f}ms, '
+                f'max {group["max_duration"]:.1f}ms'
+            ))
+            self.stdout.write(f'  sql: {plan.sql[:300]}')
+            self.stdout.write(
+                f'  worst: plan {plan.id} on {plan.method} {plan.path}, '
+                f'planning {plan.planning_time or 0:.1f}ms, '
+                f'execution {plan.execution_time or 0:.1f}ms'
+            )
+            self.stdout.write(
+                f'  indexes: {", ".join(plan.indexes) or "none"}'
+            )
+            if plan.seq_scans:
+                self.stdout.write(self.style.WARNING(
+                    f'  sequential scans: {", ".join(plan.seq_scans)}'
+                ))
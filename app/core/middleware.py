@@ -0,0 +1,105 @@
+"""
+Middlewares of the project
+"""
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from core.instrumentation import (
+    REQUESTS,
+    REQUEST_DURATION,
+    PHASE_DURATION,
+    REQUEST_QUERIES,
+    RequestMetrics,
+    current_metrics
+)
+from core.slow_queries import should_capture, capture_plans
+
+
+class InstrumentationMiddleware:
+    """
+    Record the duration, phase timings and SQL queries of every request as
+    Prometheus metrics, and report them in a Server-Timing header.
+    With SLOW_QUERY_CAPTURE, the plans of the queries of a sample of the
+    slow requests are stored as QueryPlan.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Mark the instance as a coroutine function, as Django's
+            # MiddlewareMixin does, so async views aren't run in a thread
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics(settings.SLOW_QUERY_CAPTURE)
+        token = current_metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        duration = time.perf_counter() - metrics.started
+        response = self.record(request, response, metrics, duration)
+        self.capture(request, metrics, duration)
+        return response
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics(settings.SLOW_QUERY_CAPTURE)
+        token = current_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        duration = time.perf_counter() - metrics.started
+        response = self.record(request, response, metrics, duration)
+        await sync_to_async(self.capture)(request, metrics, duration)
+        return response
+
+    @staticmethod
+    def endpoint(request):
+        """
+        Return the route of the request, used to label its metrics
+        """
+        match = request.resolver_match
+        return match.route if match is not None else 'unmatched'
+
+    def capture(self, request, metrics, duration):
+        """
+        Store the query plans of the request if it is a sampled slow one
+        """
+        if metrics.statements and should_capture(duration):
+            capture_plans(
+                request, self.endpoint(request), duration, metrics.statements
+            )
+
+    def record(self, request, response, metrics, total):
+        """
+        Export the metrics of the request and add its Server-Timing header
+        """
+        endpoint = self.endpoint(request)
+
+        REQUESTS.labels(endpoint, request.method, response.status_code).inc()
+        REQUEST_DURATION.labels(endpoint, request.method).observe(total)
+        REQUEST_QUERIES.labels(endpoint).observe(metrics.queries)
+        for phase, seconds in metrics.phases.items():
+            PHASE_DURATION.labels(endpoint, phase).inc(seconds)
+
+        if settings.SERVER_TIMING and not response.has_header('Server-Timing'):
+            timings = [
+                f'{phase};dur={seconds * 1000:.2f}'
+                + (f';desc="{metrics.queries} queries"' if phase == 'db'
+                   else '')
+                for phase, seconds in metrics.phases.items()
+            ]
+            timings.append(f'total;dur={total * 1000:.2f}')
+            response['Server-Timing'] = ', '.join(timings)
+        return response
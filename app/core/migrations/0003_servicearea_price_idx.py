@@ -0,0 +1,17 @@
+# Generated by Django 3.2.13 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_servicearea'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='servicearea',
+            index=models.Index(fields=['price', 'id'], name='core_servicearea_price_idx'),
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 3.2.13 on 2026-10-18 10:03
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_servicearea_price_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicearea',
+            name='max_lat',
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='servicearea',
+            name='max_lng',
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='servicearea',
+            name='min_lat',
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='servicearea',
+            name='min_lng',
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.RunSQL(
+            sql="""
+                UPDATE core_servicearea SET
+                    min_lng = ST_XMin(polygon),
+                    min_lat = ST_YMin(polygon),
+                    max_lng = ST_XMax(polygon),
+                    max_lat = ST_YMax(polygon)
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name='servicearea',
+            name='max_lat',
+            field=models.FloatField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='servicearea',
+            name='max_lng',
+            field=models.FloatField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='servicearea',
+            name='min_lat',
+            field=models.FloatField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='servicearea',
+            name='min_lng',
+            field=models.FloatField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='servicearea',
+            index=models.Index(fields=['min_lng', 'max_lng', 'min_lat', 'max_lat'], name='core_servicearea_bbox_idx'),
+        ),
+        migrations.CreateModel(
+            name='ServiceAreaPiece',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('polygon', django.contrib.gis.db.models.fields.GeometryField(srid=4326)),
+                ('service_area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pieces', to='core.servicearea')),
+            ],
+        ),
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO core_serviceareapiece (service_area_id, polygon)
+                SELECT id, ST_Subdivide(
+                    ST_CollectionExtract(ST_MakeValid(polygon), 3), 64
+                )
+                FROM core_servicearea
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,37 @@
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_servicearea_bbox_pieces'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceAreaSimplified',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('zoom', models.PositiveSmallIntegerField()),
+                ('polygon', django.contrib.gis.db.models.fields.GeometryField(srid=4326)),
+                ('service_area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='simplified', to='core.servicearea')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='serviceareasimplified',
+            constraint=models.UniqueConstraint(fields=('service_area', 'zoom'), name='core_serviceareasimplified_zoom_uniq'),
+        ),
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO core_serviceareasimplified
+                    (service_area_id, zoom, polygon)
+                SELECT id, zoom, ST_SimplifyPreserveTopology(
+                    polygon, 360.0 / (256 * 2 ^ zoom)
+                )
+                FROM core_servicearea, unnest(ARRAY[4, 8, 12]) AS zoom
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.13 on 2026-10-18 12:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_serviceareasimplified'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicearea',
+            name='area',
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='servicearea',
+            name='vertex_count',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+        migrations.RunSQL(
+            sql="""
+                UPDATE core_servicearea SET
+                    vertex_count = ST_NPoints(polygon),
+                    area = ST_Area(polygon)
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name='servicearea',
+            name='area',
+            field=models.FloatField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='servicearea',
+            name='vertex_count',
+            field=models.PositiveIntegerField(editable=False),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.13 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_servicearea_vertex_count_area'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueryPlan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('endpoint', models.CharField(max_length=255)),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.TextField()),
+                ('request_duration', models.FloatField(help_text='Milliseconds')),
+                ('sql', models.TextField()),
+                ('fingerprint', models.CharField(db_index=True, max_length=40)),
+                ('params', models.TextField()),
+                ('duration', models.FloatField(help_text='Milliseconds')),
+                ('plan', models.JSONField()),
+                ('planning_time', models.FloatField(null=True)),
+                ('execution_time', models.FloatField(null=True)),
+                ('seq_scans', models.JSONField(default=list)),
+                ('indexes', models.JSONField(default=list)),
+            ],
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.13 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_queryplan'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='provider',
+            index=models.Index(fields=['currency', 'language'], name='core_provider_currency_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='provider',
+            index=models.Index(fields=['language'], name='core_provider_language_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicearea',
+            index=models.Index(fields=['provider', 'price', 'id'], name='core_servicearea_provider_idx'),
+        ),
+    ]
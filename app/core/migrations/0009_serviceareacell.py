@@ -0,0 +1,27 @@
+# Generated by Django 3.2.13 on 2026-10-18 18:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_lookup_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceAreaCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cell', models.CharField(max_length=12)),
+                ('full', models.BooleanField()),
+                ('service_area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cells', to='core.servicearea')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='serviceareacell',
+            index=models.Index(fields=['cell', 'full', 'service_area'], name='core_serviceareacell_cell_idx'),
+        ),
+    ]
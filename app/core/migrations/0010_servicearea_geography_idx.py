@@ -0,0 +1,22 @@
+# Generated by Django 3.2.13 on 2026-10-18 21:12
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_serviceareacell'),
+    ]
+
+    operations = [
+        # Ranks the nearest service areas in meters (KNN `<->` ordering of
+        # the polygons cast to geography)
+        migrations.RunSQL(
+            sql="""
+                CREATE INDEX core_servicearea_geography_idx
+                ON core_servicearea USING GIST ((polygon::geography))
+            """,
+            reverse_sql='DROP INDEX core_servicearea_geography_idx',
+        ),
+    ]
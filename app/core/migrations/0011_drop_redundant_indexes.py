@@ -0,0 +1,28 @@
+# Generated by Django 3.2.13 on 2026-10-18 21:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_servicearea_geography_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='provider',
+            name='core_provider_currency_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='provider',
+            name='core_provider_language_idx',
+        ),
+        migrations.AlterField(
+            model_name='servicearea',
+            name='provider',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -1,9 +1,16 @@
+from django.conf import settings
 from django.contrib.gis.db import models
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
     PermissionsMixin,
 )
+from django.db import connection
+from django.db.models import Q
+
+from core import geohash
+from core.geometry import geohash_cover
+from core.signals import service_areas_bulk_changed
 
 
 # Create your models here.
@@ -53,17 +60,338 @@ class Provider(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
 
 
+class ServiceAreaQuerySet(models.QuerySet):
+    """
+    Custom queryset for the service areas
+    """
+
+    def containing(self, point):
+        """
+        Filter the service areas containing the point.
+        The stored bounding box prunes the candidates cheaply, then the
+        point is tested against the small subdivided pieces of the polygon.
+        A point on the boundary of the polygon is contained, on every
+        lookup path.
+        """
+        pieces = ServiceAreaPiece.objects.filter(polygon__intersects=point)
+        return self.filter(
+            min_lng__lte=point.x,
+            max_lng__gte=point.x,
+            min_lat__lte=point.y,
+            max_lat__gte=point.y,
+            id__in=pieces.values('service_area_id')
+        )
+
+    def containing_by_grid(self, point):
+        """
+        Filter the service areas containing the point through their geohash
+        cells: areas fully covering the cell of the point match right away,
+        and only the areas whose boundary crosses it are tested against
+        their pieces.
+        """
+        cell = geohash.encode(
+            point.y, point.x, settings.SERVICEAREA_GRID_PRECISION
+        )
+        cells = ServiceAreaCell.objects.filter(
+            cell__in=[cell[:length] for length in range(1, len(cell) + 1)]
+        )
+        pieces = ServiceAreaPiece.objects.filter(
+            service_area_id__in=cells.filter(full=False)
+            .values('service_area_id'),
+            polygon__intersects=point
+        )
+        return self.filter(
+            Q(id__in=cells.filter(full=True).values('service_area_id'))
+            | Q(id__in=pieces.values('service_area_id'))
+        )
+
+    def bulk_create_areas(self, service_areas, batch_size=None):
+        """
+        Bulk create service areas along with their derived geometry
+        """
+        for service_area in service_areas:
+            service_area.set_derived_fields()
+        created = self.bulk_create(service_areas, batch_size=batch_size)
+
+        ids = [service_area.pk for service_area in created]
+        self.model.objects.filter(id__in=ids).refresh_derived_geometry()
+        service_areas_bulk_changed.send(sender=self.model, ids=ids)
+        return created
+
+    def bulk_update_areas(self, service_areas, fields, batch_size=None):
+        """
+        Bulk update service areas, refreshing their derived geometry when
+        the polygon is among the updated fields
+        """
+        fields = set(fields)
+        polygon_changed = 'polygon' in fields
+        if polygon_changed:
+            for service_area in service_areas:
+                service_area.set_derived_fields()
+            fields |= set(self.model.DERIVED_FIELDS)
+        self.bulk_update(service_areas, fields, batch_size=batch_size)
+
+        ids = [service_area.pk for service_area in service_areas]
+        if polygon_changed:
+            self.model.objects.filter(id__in=ids).refresh_derived_geometry()
+        service_areas_bulk_changed.send(sender=self.model, ids=ids)
+
+    def refresh_cells(self):
+        """
+        Rebuild the geohash cells covered by these service areas
+        """
+        polygons = list(self.values_list('id', 'polygon'))
+        ServiceAreaCell.objects.filter(
+            service_area_id__in=[pk for pk, _ in polygons]
+        ).delete()
+        ServiceAreaCell.objects.bulk_create(
+            [
+                ServiceAreaCell(service_area_id=pk, cell=cell, full=full)
+                for pk, polygon in polygons
+                for cell, full in geohash_cover(
+                    polygon,
+                    settings.SERVICEAREA_GRID_PRECISION,
+                    settings.SERVICEAREA_GRID_MAX_CELLS
+                ).items()
+            ],
+            batch_size=1000
+        )
+
+    def refresh_derived_geometry(self):
+        """
+        Rebuild the geometry derived from the polygon of these service
+        areas: pieces, geohash cells when SERVICEAREA_GRID_INDEX is on and
+        simplified variants
+        """
+        ids = list(self.values_list('id', flat=True))
+        if not ids:
+            return
+
+        ServiceAreaPiece.objects.filter(service_area_id__in=ids).delete()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {ServiceAreaPiece._meta.db_table}
+                    (service_area_id, polygon)
+                SELECT id, ST_Subdivide(
+                    ST_CollectionExtract(ST_MakeValid(polygon), 3), %s
+                )
+                FROM {ServiceArea._meta.db_table}
+                WHERE id = ANY(%s)
+                """,
+                [settings.SERVICEAREA_SUBDIVIDE_MAX_VERTICES, ids]
+            )
+
+        if settings.SERVICEAREA_GRID_INDEX:
+            self.model.objects.filter(id__in=ids).refresh_cells()
+
+        zooms = settings.SERVICEAREA_SIMPLIFY_ZOOMS
+        ServiceAreaSimplified.objects.filter(service_area_id__in=ids).delete()
+        if not zooms:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {ServiceAreaSimplified._meta.db_table}
+                    (service_area_id, zoom, polygon)
+                SELECT id, levels.zoom,
+                    ST_SimplifyPreserveTopology(polygon, levels.tolerance)
+                FROM {ServiceArea._meta.db_table},
+                    unnest(%s::smallint[], %s::float8[])
+                        AS levels(zoom, tolerance)
+                WHERE id = ANY(%s)
+                """,
+                [
+                    zooms,
+                    [ServiceAreaSimplified.tolerance(z) for z in zooms],
+                    ids,
+                ]
+            )
+
+
 class ServiceArea(models.Model):
     """
     Service area model
     """
 
-    provider = models.ForeignKey(Provider, on_delete=models.CASCADE)
+    # Indexed by core_servicearea_provider_idx, which leads with it
+    provider = models.ForeignKey(
+        Provider, on_delete=models.CASCADE, db_index=False
+    )
     name = models.CharField(max_length=255)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     # Geojson information
     description = models.CharField(max_length=255)
     polygon = models.PolygonField(srid=4326)
+    # Bounding box of the polygon, maintained on save
+    min_lng = models.FloatField(editable=False)
+    min_lat = models.FloatField(editable=False)
+    max_lng = models.FloatField(editable=False)
+    max_lat = models.FloatField(editable=False)
+    # Size of the polygon, in vertices and square degrees
+    vertex_count = models.PositiveIntegerField(editable=False)
+    area = models.FloatField(editable=False)
+
+    objects = ServiceAreaQuerySet.as_manager()
+
+    # Fields computed from the polygon by set_derived_fields
+    DERIVED_FIELDS = (
+        'min_lng', 'min_lat', 'max_lng', 'max_lat', 'vertex_count', 'area'
+    )
+
+    class Meta:
+        indexes = [
+            # Cheapest first ordering of the lookup results
+            models.Index(
+                fields=['price', 'id'],
+                name='core_servicearea_price_idx'
+            ),
+            models.Index(
+                fields=['min_lng', 'max_lng', 'min_lat', 'max_lat'],
+                name='core_servicearea_bbox_idx'
+            ),
+            # Lookups filtered on a provider, cheapest first
+            models.Index(
+                fields=['provider', 'price', 'id'],
+                name='core_servicearea_provider_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
+
+    def set_derived_fields(self):
+        """
+        Compute the fields derived from the polygon.
+        Call it before saving through bulk_create or bulk_update.
+        """
+        self.min_lng, self.min_lat, self.max_lng, self.max_lat = \
+            self.polygon.extent
+        self.vertex_count = self.polygon.num_points
+        self.area = self.polygon.area
+
+    def save(self, *args, **kwargs):
+        """
+        Save the service area, keeping its derived geometry up to date
+        """
+        update_fields = kwargs.get('update_fields')
+        polygon_changed = update_fields is None or 'polygon' in update_fields
+
+        if polygon_changed:
+            self.set_derived_fields()
+            if update_fields is not None:
+                kwargs['update_fields'] = \
+                    set(update_fields) | set(self.DERIVED_FIELDS)
+
+        super().save(*args, **kwargs)
+
+        if polygon_changed:
+            ServiceArea.objects.filter(pk=self.pk).refresh_derived_geometry()
+
+
+class ServiceAreaPiece(models.Model):
+    """
+    Piece of a service area polygon with a bounded number of vertices
+    """
+
+    service_area = models.ForeignKey(
+        ServiceArea,
+        on_delete=models.CASCADE,
+        related_name='pieces'
+    )
+    polygon = models.GeometryField(srid=4326)
+
+
+class ServiceAreaSimplified(models.Model):
+    """
+    Topology preserving simplification of a service area polygon, good
+    enough to draw it on a map at the given zoom level
+    """
+
+    service_area = models.ForeignKey(
+        ServiceArea,
+        on_delete=models.CASCADE,
+        related_name='simplified'
+    )
+    zoom = models.PositiveSmallIntegerField()
+    polygon = models.GeometryField(srid=4326)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['service_area', 'zoom'],
+                name='core_serviceareasimplified_zoom_uniq'
+            ),
+        ]
+
+    @staticmethod
+    def tolerance(zoom):
+        """
+        Return the simplification tolerance in degrees at the zoom level,
+        which is the width of a pixel of a 256 pixels web map tile
+        """
+        return 360 / (256 * 2 ** zoom)
+
+    @classmethod
+    def zoom_within(cls, tolerance):
+        """
+        Return the zoom level of the coarsest stored simplification within
+        the tolerance, or None when only the full polygon is
+        """
+        return next(
+            (
+                zoom for zoom in settings.SERVICEAREA_SIMPLIFY_ZOOMS
+                if cls.tolerance(zoom) <= tolerance
+            ),
+            None
+        )
+
+
+class ServiceAreaCell(models.Model):
+    """
+    Geohash cell intersecting a service area polygon, either fully covered
+    by it or crossed by its boundary
+    """
+
+    service_area = models.ForeignKey(
+        ServiceArea,
+        on_delete=models.CASCADE,
+        related_name='cells'
+    )
+    cell = models.CharField(max_length=12)
+    full = models.BooleanField()
+
+    class Meta:
+        indexes = [
+            # Point lookups by the prefixes of the geohash of the point
+            models.Index(
+                fields=['cell', 'full', 'service_area'],
+                name='core_serviceareacell_cell_idx'
+            ),
+        ]
+
+
+class QueryPlan(models.Model):
+    """
+    Execution plan of a query captured during a slow request
+    """
+
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    endpoint = models.CharField(max_length=255)
+    method = models.CharField(max_length=10)
+    path = models.TextField()
+    request_duration = models.FloatField(help_text='Milliseconds')
+    # The SQL is kept with its placeholders, so it identifies the query
+    sql = models.TextField()
+    fingerprint = models.CharField(max_length=40, db_index=True)
+    params = models.TextField()
+    duration = models.FloatField(help_text='Milliseconds')
+    plan = models.JSONField()
+    planning_time = models.FloatField(null=True)
+    execution_time = models.FloatField(null=True)
+    # Tables read with a sequential scan and indexes used by the plan
+    seq_scans = models.JSONField(default=list)
+    indexes = models.JSONField(default=list)
+
+    def __str__(self):
+        return f'{self.endpoint} {self.duration:.1f}ms'
@@ -0,0 +1,173 @@
+"""
+Database router spreading the read-only queries over the read replicas
+"""
+import contextvars
+import itertools
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import request_started
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.dispatch import receiver
+
+
+# Models whose reads may be served by a replica
+REPLICATED_MODELS = {
+    'core.provider',
+    'core.servicearea',
+    'core.serviceareapiece',
+    'core.serviceareasimplified',
+}
+
+# Whether the reads of the current request must go to the primary
+read_primary = contextvars.ContextVar('read_primary', default=False)
+
+
+def use_primary():
+    """
+    Send the remaining reads of the current request to the primary
+    """
+    read_primary.set(True)
+
+
+@receiver(request_started)
+def reset_primary(sender, **kwargs):
+    """
+    Let every request start reading from the replicas, as worker threads
+    serve many requests
+    """
+    read_primary.set(False)
+
+
+# Cache key flagging a recent write by anyone
+RECENT_WRITE_KEY = 'db-primary:recent-write'
+
+
+def sticky_key(user_id):
+    """
+    Return the cache key flagging a provider who recently wrote
+    """
+    return f'db-primary:{user_id}'
+
+
+def remember_write(user_id):
+    """
+    Send the reads of the provider to the primary for
+    DB_REPLICA_STICKINESS seconds, so they see their own writes
+    """
+    if settings.DATABASE_REPLICAS and user_id is not None:
+        cache.set(sticky_key(user_id), True, settings.DB_REPLICA_STICKINESS)
+
+
+def remember_any_write():
+    """
+    Send the reads filling shared caches to the primary for
+    DB_REPLICA_STICKINESS seconds, so lagging replicas don't fill them with
+    data older than the write
+    """
+    if settings.DATABASE_REPLICAS:
+        cache.set(RECENT_WRITE_KEY, True, settings.DB_REPLICA_STICKINESS)
+
+
+def read_recent_writes():
+    """
+    Read from the primary for the rest of the request if anything was
+    written recently
+    """
+    if settings.DATABASE_REPLICAS and cache.get(RECENT_WRITE_KEY):
+        use_primary()
+
+
+def read_own_writes(user_id):
+    """
+    Read from the primary for the rest of the request if the provider
+    wrote recently
+    """
+    if settings.DATABASE_REPLICAS and cache.get(sticky_key(user_id)):
+        use_primary()
+
+
+class ReplicaRouter:
+    """
+    Route the reads of the replicated models round-robin to the healthy
+    replicas, and everything else to the primary. Reads stay on the primary
+    inside transactions and after a write in the same request.
+    """
+
+    def __init__(self):
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+        # alias -> monotonic time until which the replica is skipped
+        self.unhealthy_until = {}
+
+    def is_healthy(self, alias):
+        """
+        Return whether the replica can be used, connecting to it if the
+        current thread has no connection yet
+        """
+        with self.lock:
+            until = self.unhealthy_until.get(alias)
+            if until is not None:
+                if until > time.monotonic():
+                    return False
+                del self.unhealthy_until[alias]
+
+        connection = connections[alias]
+        if connection.connection is not None:
+            return True
+        try:
+            connection.ensure_connection()
+        except DatabaseError:
+            self.mark_unhealthy(alias)
+            return False
+        return True
+
+    def mark_unhealthy(self, alias):
+        """
+        Skip the replica for DB_REPLICA_COOLDOWN seconds
+        """
+        with self.lock:
+            self.unhealthy_until[alias] = (
+                time.monotonic() + settings.DB_REPLICA_COOLDOWN
+            )
+
+    def db_for_read(self, model, **hints):
+        """
+        Return the next healthy replica, or the primary
+        """
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or model._meta.label_lower not in REPLICATED_MODELS:
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if read_primary.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+
+        start = next(self.counter)
+        for offset in range(len(replicas)):
+            alias = replicas[(start + offset) % len(replicas)]
+            if self.is_healthy(alias):
+                return alias
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        """
+        Write to the primary, and read from it for the rest of the request
+        """
+        use_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """
+        The replicas hold the same data as the primary
+        """
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """
+        Only migrate the primary, the replicas follow it
+        """
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,9 @@
+"""
+Custom signals of the core app
+"""
+from django.dispatch import Signal
+
+
+# Sent after service areas are written in bulk, bypassing post_save and
+# post_delete, with the ids of the areas in `ids`
+service_areas_bulk_changed = Signal()
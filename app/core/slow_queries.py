@@ -0,0 +1,119 @@
+"""
+Capture of the execution plans of the queries of slow requests
+"""
+import hashlib
+import logging
+import random
+
+from django.conf import settings
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    DatabaseError,
+    connections,
+    transaction
+)
+
+from core.models import QueryPlan
+
+
+logger = logging.getLogger(__name__)
+
+
+def walk_plan(node):
+    """
+    Yield the node and every node below it in an EXPLAIN JSON plan
+    """
+    yield node
+    for child in node.get('Plans', ()):
+        yield from walk_plan(child)
+
+
+def explain(sql, params, using=DEFAULT_DB_ALIAS):
+    """
+    Run the query under EXPLAIN (ANALYZE, BUFFERS) on the `using` database
+    and return its plan. A failure is rolled back to a savepoint, so it
+    doesn't break the transaction of the request.
+    """
+    with transaction.atomic(using=using), \
+            connections[using].cursor() as cursor:
+        cursor.execute(
+            'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + sql, params
+        )
+        plan = cursor.fetchone()[0]
+    return plan[0] if isinstance(plan, list) else plan
+
+
+def should_capture(duration):
+    """
+    Return whether the plans of a request lasting `duration` seconds are
+    captured
+    """
+    return duration * 1000 >= settings.SLOW_QUERY_THRESHOLD \
+        and random.random() < settings.SLOW_QUERY_SAMPLE_RATE
+
+
+def capture_plans(request, endpoint, duration, statements):
+    """
+    Store the plans of the slowest SELECT queries of a slow request.
+    Only SELECT queries are explained, as EXPLAIN ANALYZE runs them again.
+    """
+    selects = sorted(
+        (
+            statement for statement in statements
+            if not statement[2]
+            and statement[0].lstrip()[:6].upper() == 'SELECT'
+        ),
+        key=lambda statement: statement[3],
+        reverse=True
+    )[:settings.SLOW_QUERY_MAX_PLANS]
+
+    for sql, params, many, seconds, using in selects:
+        try:
+            store_plan(
+                request, endpoint, duration, sql, params, seconds, using
+            )
+        except DatabaseError:
+            logger.exception('Could not capture the plan of a slow query')
+
+
+def redact(params):
+    """
+    Return the types of the query parameters, which may hold secrets like
+    the key of an auth token
+    """
+    if params is None:
+        return '[]'
+    if isinstance(params, dict):
+        return repr({name: type(value).__name__
+                     for name, value in params.items()})
+    return repr([type(value).__name__ for value in params])
+
+
+def store_plan(request, endpoint, duration, sql, params, seconds,
+               using=DEFAULT_DB_ALIAS):
+    """
+    Explain the query on the database it ran on and store its plan,
+    without the values of its parameters
+    """
+    plan = explain(sql, params, using)
+    nodes = list(walk_plan(plan['Plan']))
+    QueryPlan.objects.create(
+        endpoint=endpoint,
+        method=request.method,
+        path=request.get_full_path(),
+        request_duration=duration * 1000,
+        sql=sql,
+        fingerprint=hashlib.sha1(sql.encode()).hexdigest(),
+        params=redact(params),
+        duration=seconds * 1000,
+        plan=plan,
+        planning_time=plan.get('Planning Time'),
+        execution_time=plan.get('Execution Time'),
+        seq_scans=sorted({
+            node['Relation Name'] for node in nodes
+            if node['Node Type'] == 'Seq Scan'
+        }),
+        indexes=sorted({
+            node['Index Name'] for node in nodes if 'Index Name' in node
+        }),
+    )
@@ -1,13 +1,22 @@
 """
     Test django command
 """
+import json
+import os
+import tempfile
+from io import StringIO
 from unittest.mock import patch
 
 from psycopg2 import OperationalError as Psycopg2Error
 
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import Point, Polygon
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.models import ServiceArea, QueryPlan
 
 
 @patch('core.management.commands.wait_for_db.Command.check')
@@ -36,3 +45,288 @@ class CommandTests(SimpleTestCase):
         call_command('wait_for_db')
         self.assertAlmostEqual(patched_check.call_count, 7)
         patched_check.assert_called_with(databases=['default'])
+
+
+class ImportServiceAreasCommandTests(TestCase):
+    """
+    Test importing service areas from files
+    """
+
+    def setUp(self):
+        self.provider = get_user_model().objects.create_user(
+            email='provider@test.com',
+            password='Testpass123',
+        )
+
+    def write_file(self, suffix, content):
+        """
+        Write a temporary file removed after the test
+        """
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def feature(self, i, coordinates=None):
+        """
+        Return a GeoJSON polygon feature
+        """
+        return {
+            'type': 'Feature',
+            'properties': {'name': f'Area {i}', 'price': '1.50'},
+            'geometry': {
+                'type': 'Polygon',
+                'coordinates': coordinates or [
+                    [[i, 0], [i, 1], [i + 1, 1], [i + 1, 0], [i, 0]]
+                ],
+            },
+        }
+
+    def test_import_geojson(self):
+        """
+        Test importing a FeatureCollection in batches
+        """
+        path = self.write_file('.geojson', json.dumps({
+            'type': 'FeatureCollection',
+            'features': [self.feature(i) for i in range(5)],
+        }))
+
+        call_command(
+            'import_serviceareas', path,
+            provider=self.provider.email, batch_size=2, stdout=StringIO()
+        )
+
+        self.assertEqual(ServiceArea.objects.count(), 5)
+        service_area = ServiceArea.objects.get(name='Area 3')
+        self.assertEqual(service_area.provider, self.provider)
+        self.assertEqual(service_area.min_lng, 3)
+        self.assertTrue(service_area.pieces.exists())
+
+    def test_import_csv(self):
+        """
+        Test importing a CSV file with WKT polygons
+        """
+        path = self.write_file('.csv', (
+            'name,price,description,provider,wkt\n'
+            'Area,2.00,Test,provider@test.com,'
+            '"POLYGON ((0 0, 0 1, 1 1, 1 0, 0 0))"\n'
+        ))
+
+        call_command('import_serviceareas', path, stdout=StringIO())
+
+        service_area = ServiceArea.objects.get()
+        self.assertEqual(service_area.name, 'Area')
+        self.assertEqual(service_area.provider, self.provider)
+
+    def test_import_invalid_polygon(self):
+        """
+        Test an invalid polygon aborts the whole import
+        """
+        bowtie = [[[0, 0], [1, 1], [1, 0], [0, 1], [0, 0]]]
+        path = self.write_file('.geojson', json.dumps({
+            'type': 'FeatureCollection',
+            'features': [self.feature(0), self.feature(1, bowtie)],
+        }))
+
+        with self.assertRaises(CommandError):
+            call_command(
+                'import_serviceareas', path,
+                provider=self.provider.email, batch_size=1,
+                stdout=StringIO()
+            )
+        self.assertEqual(ServiceArea.objects.count(), 0)
+
+    def test_import_invalid_fields(self):
+        """
+        Test names and prices the columns can't hold abort the import,
+        naming the feature
+        """
+        for properties, message in (
+            ({'name': 'A' * 256, 'price': '1.50'}, 'Invalid name'),
+            ({'name': 'Area', 'price': '123456789.00'}, 'Invalid price'),
+            ({'name': 'Area', 'price': '1.505'}, 'Invalid price'),
+        ):
+            feature = {**self.feature(0), 'properties': properties}
+            path = self.write_file('.geojson', json.dumps({
+                'type': 'FeatureCollection',
+                'features': [self.feature(1), feature],
+            }))
+
+            with self.subTest(properties=properties):
+                with self.assertRaisesRegex(
+                    CommandError, rf'^Row 2 \((A+|Area)\): {message}'
+                ):
+                    call_command(
+                        'import_serviceareas', path,
+                        provider=self.provider.email, stdout=StringIO()
+                    )
+                self.assertEqual(ServiceArea.objects.count(), 0)
+
+
+class BenchmarkServiceAreaCommandTests(TestCase):
+    """
+    Test the service area benchmark
+    """
+
+    def test_benchmark_reports_scenarios(self):
+        """
+        Test a small sequential run reports every scenario and cleans up
+        """
+        out = StringIO()
+        call_command(
+            'benchmark_servicearea',
+            providers=2, areas=20, vertices=8, lookups=10, writes=3,
+            concurrency=1, keep_connections=True, stdout=out
+        )
+
+        report = out.getvalue()
+        for scenario in ('lookup', 'create', 'update'):
+            self.assertIn(scenario, report)
+        self.assertEqual(get_user_model().objects.count(), 0)
+        self.assertEqual(ServiceArea.objects.count(), 0)
+
+
+class FixServiceAreaAxisOrderCommandTests(TestCase):
+    """
+    Test fixing the axis order of service areas
+    """
+
+    def setUp(self):
+        self.provider = get_user_model().objects.create_user(
+            email='provider@test.com',
+            password='Testpass123',
+        )
+        # Written as (latitude, longitude) for a point at lng 10, lat 1
+        self.service_area = ServiceArea.objects.create(
+            provider=self.provider,
+            name='Area',
+            description='Test',
+            price='1.00',
+            polygon=Polygon(((0, 9), (0, 11), (2, 11), (2, 9), (0, 9))),
+        )
+
+    def test_selection_required(self):
+        """
+        Test the service areas to fix must be selected
+        """
+        with self.assertRaises(CommandError):
+            call_command('fix_servicearea_axis_order', stdout=StringIO())
+
+    def test_dry_run(self):
+        """
+        Test a dry run leaves the service areas untouched
+        """
+        out = StringIO()
+        call_command(
+            'fix_servicearea_axis_order', all=True, dry_run=True, stdout=out
+        )
+
+        self.assertIn('1 service areas would be fixed', out.getvalue())
+        self.service_area.refresh_from_db()
+        self.assertEqual(self.service_area.min_lng, 0)
+
+    def test_fix_axis_order(self):
+        """
+        Test the coordinates and the derived geometry are swapped
+        """
+        call_command(
+            'fix_servicearea_axis_order',
+            ids=[self.service_area.id], stdout=StringIO()
+        )
+
+        self.service_area.refresh_from_db()
+        self.assertEqual(
+            (self.service_area.min_lng, self.service_area.min_lat,
+             self.service_area.max_lng, self.service_area.max_lat),
+            (9, 0, 11, 2)
+        )
+        self.assertTrue(
+            self.service_area.polygon.exterior_ring.is_counterclockwise
+        )
+        self.assertEqual(
+            ServiceArea.objects.containing(Point(10, 1)).get(),
+            self.service_area
+        )
+
+
+@override_settings(SERVICEAREA_GRID_INDEX=True)
+class RebuildServiceAreaCellsCommandTests(TestCase):
+    """
+    Test rebuilding the geohash cells of the service areas
+    """
+
+    def test_rebuild_cells(self):
+        """
+        Test the cells of every service area are rebuilt
+        """
+        provider = get_user_model().objects.create_user(
+            email='provider@test.com',
+            password='Testpass123',
+        )
+        service_area = ServiceArea.objects.create(
+            provider=provider,
+            name='Area',
+            description='Test',
+            price='1.00',
+            polygon=Polygon(((0, 0), (1, 0), (1, 1), (0, 1), (0, 0))),
+        )
+        cells = set(service_area.cells.values_list('cell', 'full'))
+        service_area.cells.all().delete()
+
+        out = StringIO()
+        call_command('rebuild_servicearea_cells', stdout=out)
+
+        self.assertIn('1/1', out.getvalue())
+        self.assertEqual(
+            set(service_area.cells.values_list('cell', 'full')), cells
+        )
+
+
+class SlowQueriesCommandTests(TestCase):
+    """
+    Test summarizing the captured query plans
+    """
+
+    def create_plan(self, duration, seq_scans=()):
+        """
+        Create a captured plan
+        """
+        return QueryPlan.objects.create(
+            endpoint='api/servicearea/servicearea-list/',
+            method='GET',
+            path='/api/servicearea/servicearea-list/?latitude=1&longitude=2',
+            request_duration=duration * 2,
+            sql='SELECT * FROM core_servicearea',
+            fingerprint='fingerprint',
+            params='()',
+            duration=duration,
+            plan={'Plan': {'Node Type': 'Seq Scan'}},
+            planning_time=0.1,
+            execution_time=duration,
+            seq_scans=list(seq_scans),
+        )
+
+    def test_summary(self):
+        """
+        Test the queries are grouped and their sequential scans reported
+        """
+        self.create_plan(100)
+        self.create_plan(300, seq_scans=['core_servicearea'])
+
+        out = StringIO()
+        call_command('slow_queries', stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('2 captured, avg 200.0ms, max 300.0ms', output)
+        self.assertIn('sequential scans: core_servicearea', output)
+
+    def test_purge(self):
+        """
+        Test purging the old plans
+        """
+        self.create_plan(100)
+
+        call_command('slow_queries', purge=True, hours=0, stdout=StringIO())
+
+        self.assertFalse(QueryPlan.objects.exists())
@@ -0,0 +1,30 @@
+"""
+Test for the geohash encoding
+"""
+from django.test import SimpleTestCase
+
+from core import geohash
+
+
+class GeohashTests(SimpleTestCase):
+    """
+    Test for the geohash encoding
+    """
+
+    def test_encode(self):
+        """
+        Test encoding a point
+        """
+        self.assertEqual(geohash.encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(geohash.encode(-90, -180, 3), '000')
+
+    def test_bounds_contain_point(self):
+        """
+        Test the cell of a point contains it
+        """
+        min_lat, min_lng, max_lat, max_lng = geohash.bounds(
+            geohash.encode(-22.9068, -43.1729, 7)
+        )
+
+        self.assertTrue(min_lat <= -22.9068 <= max_lat)
+        self.assertTrue(min_lng <= -43.1729 <= max_lng)
@@ -0,0 +1,124 @@
+"""
+Test for the polygon validation and normalization
+"""
+from django.test import SimpleTestCase, override_settings
+from django.contrib.gis.geos import Polygon, Point
+
+from core import geohash
+from core.geometry import build_polygon, normalize_polygon, geohash_cover
+
+
+class GeometryTests(SimpleTestCase):
+    """
+    Test for the polygon validation and normalization
+    """
+
+    def test_build_polygon_cleans_ring(self):
+        """
+        Test repeated vertices are dropped and the ring is closed
+        """
+        polygon = build_polygon([
+            [(0, 0), (1, 0), (1, 0), (1, 1), (0, 1), (0, 1)]
+        ])
+
+        self.assertEqual(
+            polygon.coords,
+            (((0, 0), (1, 0), (1, 1), (0, 1), (0, 0)),)
+        )
+        self.assertEqual(polygon.srid, 4326)
+
+    def test_build_polygon_orients_rings(self):
+        """
+        Test the exterior ring is counterclockwise and holes clockwise
+        """
+        polygon = build_polygon([
+            [(0, 0), (0, 4), (4, 4), (4, 0)],
+            [(1, 1), (2, 1), (2, 2), (1, 2)],
+        ])
+
+        self.assertTrue(polygon.exterior_ring.is_counterclockwise)
+        self.assertFalse(polygon[1].is_counterclockwise)
+        self.assertEqual(polygon.area, 15)
+
+    def test_build_polygon_repairs_spike(self):
+        """
+        Test a self intersection not changing the area is repaired
+        """
+        polygon = build_polygon([
+            [(0, 0), (2, 0), (2, 2), (1, 2), (1, 3), (1, 2), (0, 2)]
+        ])
+
+        self.assertTrue(polygon.valid)
+        self.assertEqual(polygon.area, 4)
+        self.assertTrue(polygon.contains(Point(1, 1)))
+
+    def test_build_polygon_rejects_invalid(self):
+        """
+        Test polygons which can't be repaired are rejected
+        """
+        invalid = (
+            # Bow tie, only one of its halves would be kept
+            [[(0, 0), (1, 1), (1, 0), (0, 1)]],
+            # Collinear vertices
+            [[(0, 0), (1, 1), (2, 2)]],
+            # Too few vertices
+            [[(0, 0), (1, 1), (1, 1)]],
+            [[(0, 0), (1, float('nan')), (1, 1)]],
+            [],
+        )
+        for rings in invalid:
+            with self.assertRaises(ValueError):
+                build_polygon(rings)
+
+    @override_settings(SERVICEAREA_MAX_VERTICES=10)
+    def test_build_polygon_rejects_too_many_vertices(self):
+        """
+        Test polygons with too many vertices are rejected
+        """
+        with self.assertRaises(ValueError):
+            build_polygon([Point(0, 0).buffer(1).coords[0]])
+
+    def test_normalize_polygon(self):
+        """
+        Test normalizing an existing polygon
+        """
+        polygon = normalize_polygon(
+            Polygon(((0, 0), (0, 1), (1, 1), (1, 0), (0, 0)))
+        )
+
+        self.assertTrue(polygon.exterior_ring.is_counterclockwise)
+        with self.assertRaises(ValueError):
+            normalize_polygon(Point(0, 0))
+
+    def test_geohash_cover(self):
+        """
+        Test the cells cover the polygon, full ones lying inside it
+        """
+        polygon = Polygon(((0, 0), (0.3, 0), (0.3, 0.2), (0, 0.2), (0, 0)))
+
+        cells = geohash_cover(polygon, 5, 1024)
+
+        self.assertTrue(any(cells.values()))
+        self.assertTrue(not all(cells.values()))
+        self.assertTrue(all(len(cell) <= 5 for cell in cells))
+        for cell, full in cells.items():
+            min_lat, min_lng, max_lat, max_lng = geohash.bounds(cell)
+            box = Polygon.from_bbox((min_lng, min_lat, max_lng, max_lat))
+            self.assertEqual(polygon.covers(box), full)
+            self.assertTrue(polygon.intersects(box))
+        for point in (Point(0.1, 0.1), Point(0.29, 0.01)):
+            cell = geohash.encode(point.y, point.x, 5)
+            self.assertEqual(
+                sum(cell.startswith(c) for c in cells), 1
+            )
+
+    def test_geohash_cover_max_cells(self):
+        """
+        Test the cells stop being split when there would be too many
+        """
+        polygon = Point(0, 0).buffer(1, quadsegs=64)
+
+        cells = geohash_cover(polygon, 8, 100)
+
+        self.assertLessEqual(len(cells), 100)
+        self.assertTrue(any(len(cell) < 8 for cell in cells))
@@ -0,0 +1,139 @@
+"""
+Test the instrumentation middleware
+"""
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import Polygon
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ServiceArea, QueryPlan
+from core.slow_queries import redact
+
+from decimal import Decimal
+
+
+SERVICEAREA_URL = reverse('servicearea:servicearea-list')
+METRICS_URL = reverse('metrics')
+
+
+class InstrumentationMiddlewareTests(TestCase):
+    """
+    Test the instrumentation middleware
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com',
+            password='Testpass123',
+            name='Test Name',
+        )
+        self.client.force_authenticate(self.user)
+        ServiceArea.objects.create(
+            provider=self.user,
+            name='Test Service Area',
+            polygon=Polygon(((0, 0), (0, 1), (1, 1), (1, 0), (0, 0))),
+            price=Decimal('1.00'),
+            description='Test Service'
+        )
+
+    @override_settings(SERVER_TIMING=True)
+    def test_server_timing(self):
+        """
+        Test the phases and queries of a request are reported
+        """
+        res = self.client.get(
+            SERVICEAREA_URL, {'latitude': 0.5, 'longitude': 0.5}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        timing = res['Server-Timing']
+        for phase in ('auth;dur=', 'db;dur=', 'serialize;dur=',
+                      'render;dur=', 'total;dur='):
+            self.assertIn(phase, timing)
+        self.assertIn('desc="1 queries"', timing)
+
+    def test_server_timing_disabled(self):
+        """
+        Test the Server-Timing header is off by default
+        """
+        res = self.client.get(
+            SERVICEAREA_URL, {'latitude': 0.5, 'longitude': 0.5}
+        )
+
+        self.assertFalse(res.has_header('Server-Timing'))
+
+    def test_metrics(self):
+        """
+        Test the request metrics are exposed per endpoint
+        """
+        self.client.get(SERVICEAREA_URL, {'latitude': 0.5, 'longitude': 0.5})
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        content = res.content.decode()
+        self.assertRegex(
+            content,
+            r'http_requests_total\{endpoint="api/servicearea/[^"]*'
+            r'servicearea-list[^"]*",method="GET",status="200"\}'
+        )
+        self.assertIn('http_request_db_queries_bucket', content)
+        self.assertIn('http_request_phase_seconds_total', content)
+
+    @override_settings(METRICS_ALLOWED_NETWORKS=['10.0.0.0/8'])
+    def test_metrics_access(self):
+        """
+        Test the metrics are only exposed to the allowed networks and to
+        staff users
+        """
+        res = self.client.get(METRICS_URL, REMOTE_ADDR='192.0.2.1')
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        res = self.client.get(METRICS_URL, REMOTE_ADDR='10.1.2.3')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+        res = self.client.get(METRICS_URL, REMOTE_ADDR='192.0.2.1')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @override_settings(
+        SLOW_QUERY_CAPTURE=True,
+        SLOW_QUERY_THRESHOLD=0,
+        SLOW_QUERY_SAMPLE_RATE=1
+    )
+    def test_slow_query_plans_captured(self):
+        """
+        Test the plans of the queries of slow requests are stored
+        """
+        self.client.get(SERVICEAREA_URL, {'latitude': 0.5, 'longitude': 0.5})
+
+        plan = QueryPlan.objects.get()
+        self.assertIn('servicearea-list', plan.endpoint)
+        self.assertIn('latitude=0.5', plan.path)
+        self.assertTrue(plan.sql.startswith('SELECT'))
+        self.assertIn('Plan', plan.plan)
+        self.assertIsNotNone(plan.execution_time)
+        self.assertNotIn('0.5', plan.params)
+
+    def test_redacted_params(self):
+        """
+        Test only the types of the query parameters are stored
+        """
+        self.assertEqual(redact(['secret-token', 1.5]), "['str', 'float']")
+        self.assertEqual(redact({'key': 'secret-token'}), "{'key': 'str'}")
+        self.assertEqual(redact(None), '[]')
+
+    @override_settings(SLOW_QUERY_CAPTURE=True, SLOW_QUERY_SAMPLE_RATE=1)
+    def test_fast_query_plans_not_captured(self):
+        """
+        Test requests under the threshold are not explained
+        """
+        self.client.get(SERVICEAREA_URL, {'latitude': 0.5, 'longitude': 0.5})
+
+        self.assertFalse(QueryPlan.objects.exists())
@@ -1,7 +1,8 @@
 """
 Test for models
 """
-from django.test import TestCase
+from django.conf import settings
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.contrib.gis.geos import Polygon, Point
 
@@ -238,3 +239,155 @@ class ModelTests(TestCase):
             0,
             ServiceArea.objects.filter(polygon__contains=lat_lng).count()
         )
+
+    def test_service_area_derived_geometry(self):
+        """
+        Test the bounding box, size and pieces are maintained on save
+        """
+        provider = get_user_model().objects.create_user(
+            email=self.user_test["email"],
+            password=self.user_test['password'],
+        )
+        service_area = ServiceArea.objects.create(
+            name='Test Service Area provider',
+            polygon=Polygon(((0, 0), (0, 1), (2, 1), (2, 0), (0, 0))),
+            description='Test Service provider',
+            price=10,
+            provider=provider
+        )
+
+        self.assertEqual(
+            (service_area.min_lng, service_area.min_lat,
+             service_area.max_lng, service_area.max_lat),
+            (0, 0, 2, 1)
+        )
+        self.assertEqual(service_area.vertex_count, 5)
+        self.assertEqual(service_area.area, 2)
+        self.assertTrue(service_area.pieces.exists())
+
+        service_area.polygon = Polygon(
+            ((5, 5), (5, 6), (6, 6), (6, 5), (5, 5))
+        )
+        service_area.save()
+
+        self.assertEqual(service_area.min_lng, 5)
+        self.assertFalse(
+            ServiceArea.objects.containing(Point(1.5, 0.5)).exists()
+        )
+        self.assertEqual(
+            ServiceArea.objects.containing(Point(5.5, 5.5)).get(),
+            service_area
+        )
+
+    def test_service_area_containing_many_vertices(self):
+        """
+        Test the lookup on a polygon split into many pieces
+        """
+        provider = get_user_model().objects.create_user(
+            email=self.user_test["email"],
+            password=self.user_test['password'],
+        )
+        circle = Point(0, 0).buffer(10, quadsegs=256)
+        service_area = ServiceArea.objects.create(
+            name='Test Service Area provider',
+            polygon=circle,
+            description='Test Service provider',
+            price=10,
+            provider=provider
+        )
+
+        self.assertGreater(service_area.pieces.count(), 1)
+        for point in (Point(0, 0), Point(9.9, 0), Point(-3, 7)):
+            self.assertEqual(
+                ServiceArea.objects.containing(point).get(),
+                service_area
+            )
+        self.assertFalse(
+            ServiceArea.objects.containing(Point(9.9, 9.9)).exists()
+        )
+
+    def test_service_area_simplified_variants(self):
+        """
+        Test the simplified polygons are stored per zoom level on save
+        """
+        provider = get_user_model().objects.create_user(
+            email=self.user_test["email"],
+            password=self.user_test['password'],
+        )
+        circle = Point(0, 0).buffer(10, quadsegs=256)
+        service_area = ServiceArea.objects.create(
+            name='Test Service Area provider',
+            polygon=circle,
+            description='Test Service provider',
+            price=10,
+            provider=provider
+        )
+
+        simplified = dict(
+            service_area.simplified.values_list('zoom', 'polygon')
+        )
+        self.assertEqual(
+            sorted(simplified), settings.SERVICEAREA_SIMPLIFY_ZOOMS
+        )
+        vertices = [simplified[zoom].num_points for zoom in sorted(simplified)]
+        self.assertEqual(vertices, sorted(vertices))
+        self.assertLess(vertices[0], circle.num_points)
+
+    @override_settings(SERVICEAREA_GRID_INDEX=True,
+                       SERVICEAREA_GRID_PRECISION=6)
+    def test_service_area_cells(self):
+        """
+        Test the geohash cells are maintained on save and answer the
+        same lookups as the pieces
+        """
+        provider = get_user_model().objects.create_user(
+            email=self.user_test["email"],
+            password=self.user_test['password'],
+        )
+        service_area = ServiceArea.objects.create(
+            name='Test Service Area provider',
+            polygon=Polygon(((0, 0), (1, 0), (0, 1), (0, 0))),
+            description='Test Service provider',
+            price=10,
+            provider=provider
+        )
+        cells = set(service_area.cells.values_list('cell', 'full'))
+        self.assertTrue(cells)
+        self.assertIn(True, {full for _, full in cells})
+
+        for point in (Point(0.1, 0.1), Point(0.49, 0.49), Point(0.6, 0.6),
+                      Point(2, 2)):
+            self.assertEqual(
+                list(ServiceArea.objects.containing_by_grid(point)),
+                list(ServiceArea.objects.containing(point))
+            )
+
+        service_area.polygon = Polygon(
+            ((5, 5), (6, 5), (6, 6), (5, 6), (5, 5))
+        )
+        service_area.save()
+        self.assertNotEqual(
+            set(service_area.cells.values_list('cell', 'full')), cells
+        )
+        self.assertTrue(
+            ServiceArea.objects.containing_by_grid(Point(5.5, 5.5)).exists()
+        )
+
+    @override_settings(SERVICEAREA_GRID_INDEX=False)
+    def test_service_area_cells_disabled(self):
+        """
+        Test no geohash cells are computed while the grid index is off
+        """
+        provider = get_user_model().objects.create_user(
+            email=self.user_test["email"],
+            password=self.user_test['password'],
+        )
+        service_area = ServiceArea.objects.create(
+            name='Test Service Area provider',
+            polygon=Polygon(((0, 0), (1, 0), (0, 1), (0, 0))),
+            description='Test Service provider',
+            price=10,
+            provider=provider
+        )
+
+        self.assertFalse(service_area.cells.exists())
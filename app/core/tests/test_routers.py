@@ -0,0 +1,109 @@
+"""
+Test for the read replica database router
+"""
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.signals import request_started
+from django.test import SimpleTestCase, override_settings
+
+from core import routers
+from core.models import Provider, QueryPlan, ServiceArea
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1', 'replica_2'])
+class ReplicaRouterTests(SimpleTestCase):
+    """Test routing the queries to the primary and the replicas"""
+
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        token = routers.read_primary.set(False)
+        self.addCleanup(routers.read_primary.reset, token)
+        cache.clear()
+
+    def healthy(self, *aliases):
+        """Patch the health check to only accept the given replicas"""
+        return patch.object(
+            self.router, 'is_healthy', side_effect=lambda a: a in aliases
+        )
+
+    def test_reads_round_robin(self):
+        """Test reads alternate between the healthy replicas"""
+        with self.healthy('replica_1', 'replica_2'):
+            aliases = [
+                self.router.db_for_read(ServiceArea) for _ in range(4)
+            ]
+
+        self.assertEqual(
+            aliases, ['replica_1', 'replica_2', 'replica_1', 'replica_2']
+        )
+
+    def test_unhealthy_replica_skipped(self):
+        """Test reads skip the failing replicas, then use the primary"""
+        with self.healthy('replica_2'):
+            aliases = {self.router.db_for_read(Provider) for _ in range(3)}
+        self.assertEqual(aliases, {'replica_2'})
+
+        with self.healthy():
+            self.assertEqual(self.router.db_for_read(Provider), 'default')
+
+    def test_cooldown(self):
+        """Test a replica marked unhealthy isn't connected to again"""
+        self.router.mark_unhealthy('replica_1')
+
+        self.assertFalse(self.router.is_healthy('replica_1'))
+
+    def test_other_models_not_routed(self):
+        """Test reads of the models not replicated use the primary"""
+        with self.healthy('replica_1', 'replica_2'):
+            self.assertIsNone(self.router.db_for_read(QueryPlan))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        """Test reads use the primary without replicas"""
+        self.assertIsNone(self.router.db_for_read(ServiceArea))
+
+    def test_reads_after_write_use_primary(self):
+        """Test the reads following a write in a request use the primary"""
+        self.assertEqual(self.router.db_for_write(ServiceArea), 'default')
+
+        with self.healthy('replica_1', 'replica_2'):
+            self.assertEqual(self.router.db_for_read(ServiceArea), 'default')
+
+            request_started.send(sender=self.__class__)
+            self.assertEqual(
+                self.router.db_for_read(ServiceArea), 'replica_1'
+            )
+
+    def test_read_own_writes(self):
+        """Test a provider who wrote recently reads from the primary"""
+        routers.read_own_writes(1)
+        self.assertFalse(routers.read_primary.get())
+
+        routers.remember_write(1)
+        routers.read_own_writes(2)
+        self.assertFalse(routers.read_primary.get())
+
+        routers.read_own_writes(1)
+        self.assertTrue(routers.read_primary.get())
+
+    def test_read_recent_writes(self):
+        """Test any recent write sends the cache filling reads to primary"""
+        routers.read_recent_writes()
+        self.assertFalse(routers.read_primary.get())
+
+        routers.remember_any_write()
+        routers.read_recent_writes()
+        self.assertTrue(routers.read_primary.get())
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_recent_writes_without_replicas(self):
+        """Test nothing is flagged without replicas"""
+        routers.remember_any_write()
+        routers.read_recent_writes()
+        self.assertFalse(routers.read_primary.get())
+
+    def test_migrations_on_primary_only(self):
+        """Test only the primary is migrated"""
+        self.assertTrue(self.router.allow_migrate('default', 'core'))
+        self.assertFalse(self.router.allow_migrate('replica_1', 'core'))
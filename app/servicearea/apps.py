@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ServiceareaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'servicearea'
+
+    def ready(self):
+        import servicearea.signals # noqa
@@ -0,0 +1,177 @@
+"""
+Async views for the service area APIs, served through ASGI
+"""
+import asyncio
+import contextvars
+import math
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.http import HttpResponse
+
+from rest_framework import exceptions
+
+from core.instrumentation import timer
+
+from user.authentication import CachedTokenAuthentication, token_cache
+
+from servicearea.queries import lookup_results
+from servicearea.renderers import dumps
+from servicearea.serializers import LookupQuerySerializer
+from servicearea.throttling import (
+    TokenBucketThrottle,
+    Overloaded,
+    bucket_store,
+    in_flight
+)
+
+
+# Threads running the blocking database work of the async views, each
+# holding its own database connection
+EXECUTOR_WORKERS = settings.SERVICEAREA_ASYNC_MAX_CONCURRENCY
+executor = ThreadPoolExecutor(
+    max_workers=EXECUTOR_WORKERS,
+    thread_name_prefix='servicearea-lookup'
+)
+semaphores = weakref.WeakKeyDictionary()
+
+
+def close_executor_connections():
+    """
+    Close the database connections of every executor thread, which
+    CONN_MAX_AGE otherwise keeps open, e.g. before the test database is
+    dropped. Wait for the running lookups.
+    """
+    # Every thread blocks on the barrier, so each runs exactly one close
+    barrier = threading.Barrier(EXECUTOR_WORKERS)
+
+    def close():
+        barrier.wait()
+        connections.close_all()
+
+    for future in [executor.submit(close) for _ in range(EXECUTOR_WORKERS)]:
+        future.result()
+
+
+def get_semaphore():
+    """
+    Return the semaphore bounding the lookups in flight on the running loop
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in semaphores:
+        semaphores[loop] = asyncio.Semaphore(
+            settings.SERVICEAREA_ASYNC_MAX_CONCURRENCY
+        )
+    return semaphores[loop]
+
+
+async def check_throttle(request):
+    """
+    Return the Throttled error of the request when the lookups of the
+    client are throttled, else None. The buckets and tokens kept in a
+    shared cache are read off the event loop.
+    """
+    throttle = TokenBucketThrottle('lookup')
+    if bucket_store.shared is None and token_cache.shared is None:
+        allowed = throttle.allow_request(request, None)
+    else:
+        allowed = await sync_to_async(
+            throttle.allow_request, thread_sensitive=False
+        )(request, None)
+    if allowed:
+        return None
+    return exceptions.Throttled(throttle.wait())
+
+
+def lookup_sync(request):
+    """
+    Authenticate the request and return (status, data) of the lookup
+    """
+    close_old_connections()
+    try:
+        try:
+            with timer('auth'):
+                credentials = CachedTokenAuthentication().authenticate(
+                    request
+                )
+        except exceptions.AuthenticationFailed as error:
+            return 401, {'detail': str(error.detail)}
+        if credentials is None:
+            return 401, {
+                'detail': 'Authentication credentials were not provided.'
+            }
+
+        serializer = LookupQuerySerializer(data=request.GET)
+        if not serializer.is_valid():
+            return 400, serializer.errors
+        return 200, {'results': lookup_results(serializer.validated_data)}
+    finally:
+        close_old_connections()
+
+
+async def lookup(request):
+    """
+    List the service areas containing a point without blocking the event
+    loop on the database. The results are built by the same lookup_results
+    as servicearea-list, but only the first page is returned: there is no
+    cursor pagination, response cache or ETag.
+    ---
+    Query parameters:
+        - latitude
+        - longitude
+        - fields, include, order_by: as in servicearea-list
+        - limit: maximum number of service areas returned
+        - precision, nearest, radius: as in servicearea-list
+    """
+    if request.method != 'GET':
+        return HttpResponse(
+            dumps({'detail': f'Method "{request.method}" not allowed.'}),
+            status=405,
+            content_type='application/json'
+        )
+
+    # Throttled clients are answered before taking a slot, so they can't
+    # crowd out the others
+    throttled = await check_throttle(request)
+    if throttled is not None:
+        return error_response(throttled)
+    if not in_flight.acquire():
+        return error_response(Overloaded())
+
+    # Run in a copy of the context, so the thread records its queries and
+    # timings in the metrics of the request
+    context = contextvars.copy_context()
+    try:
+        async with get_semaphore():
+            status, data = await asyncio.get_running_loop().run_in_executor(
+                executor, context.run, lookup_sync, request
+            )
+    finally:
+        in_flight.release()
+
+    with timer('render'):
+        body = dumps(data)
+    response = HttpResponse(
+        body, status=status, content_type='application/json'
+    )
+    if status == 401:
+        response['WWW-Authenticate'] = 'Token'
+    return response
+
+
+def error_response(error):
+    """
+    Return the JSON response of a throttling or load shedding error
+    """
+    response = HttpResponse(
+        dumps({'detail': str(error.detail)}),
+        status=error.status_code,
+        content_type='application/json'
+    )
+    response['Retry-After'] = str(math.ceil(error.wait))
+    return response
@@ -0,0 +1,135 @@
+"""
+Parsing of the service area polygons sent to the APIs.
+Every format is read as (longitude, latitude), the axis order of the
+points looked up.
+"""
+import base64
+import binascii
+import json
+
+from django.contrib.gis.geos import GEOSException, GEOSGeometry
+
+from rest_framework.exceptions import ValidationError
+
+from core.geometry import build_polygon, normalize_polygon
+
+
+# Request fields a polygon can be sent in, one per format
+POLYGON_INPUT_KEYS = ('polygon', 'polyline', 'wkb')
+POLYLINE_PRECISION = 5
+
+
+def parse_polygon(points):
+    """
+    Build a valid Polygon from a list of {"lat": ..., "lng": ...} vertices
+    """
+    try:
+        ring = [(float(i['lng']), float(i['lat'])) for i in points]
+    except Exception:
+        raise ValueError('Polygon is not valid')
+    return build_polygon([ring])
+
+
+def parse_geojson(geometry):
+    """
+    Build a valid Polygon from a GeoJSON Polygon geometry
+    """
+    if not isinstance(geometry, dict) or geometry.get('type') != 'Polygon':
+        raise ValueError('Expected a GeoJSON Polygon geometry')
+    try:
+        return build_polygon(geometry['coordinates'])
+    except (KeyError, IndexError, TypeError):
+        raise ValueError('Polygon is not valid')
+
+
+def decode_polyline(text, precision=POLYLINE_PRECISION):
+    """
+    Return the (longitude, latitude) vertices of an encoded polyline
+    """
+    factor = 10 ** precision
+    coords = []
+    index = latitude = longitude = 0
+    while index < len(text):
+        deltas = []
+        for _ in range(2):
+            result = shift = 0
+            while True:
+                if index >= len(text):
+                    raise ValueError('Polyline is truncated')
+                chunk = ord(text[index]) - 63
+                index += 1
+                if not 0 <= chunk < 64:
+                    raise ValueError('Polyline is not valid')
+                result |= (chunk & 0x1f) << shift
+                shift += 5
+                if chunk < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        latitude += deltas[0]
+        longitude += deltas[1]
+        coords.append((longitude / factor, latitude / factor))
+    return coords
+
+
+def parse_polyline(text):
+    """
+    Build a valid Polygon from the encoded polyline of its exterior ring
+    """
+    return build_polygon([decode_polyline(text)])
+
+
+def parse_wkb(text):
+    """
+    Build a valid Polygon from its base64 encoded WKB or EWKB
+    """
+    try:
+        polygon = GEOSGeometry(memoryview(base64.b64decode(text)))
+    except (binascii.Error, GEOSException, TypeError):
+        raise ValueError('WKB is not valid')
+    if polygon.srid not in (None, 4326):
+        raise ValueError('WKB polygons must be in EPSG:4326')
+    return normalize_polygon(polygon)
+
+
+def parse_polygon_input(key, value):
+    """
+    Build a valid Polygon from the value of one of the POLYGON_INPUT_KEYS
+    """
+    if key == 'polyline':
+        return parse_polyline(value)
+    if key == 'wkb':
+        return parse_wkb(value)
+
+    if isinstance(value, str):
+        value = json.loads(value)
+    if isinstance(value, dict):
+        return parse_geojson(value)
+    return parse_polygon(value)
+
+
+def polygon_from_request(request):
+    """
+    Return the polygon sent in a JSON or form request
+    """
+    keys = [key for key in POLYGON_INPUT_KEYS if key in request.data]
+    if len(keys) != 1:
+        raise ValidationError({
+            'polygon': ['Send exactly one of polygon, polyline or wkb']
+        })
+    key = keys[0]
+    value = request.data[key]
+
+    try:
+        if key == 'polygon' and hasattr(request.data, 'getlist'):
+            # Form requests repeat the field per vertex, as Python dicts
+            values = [
+                json.loads(i.replace("'", "\""))
+                for i in request.data.getlist('polygon')
+            ]
+            value = values
+            if len(values) == 1 and isinstance(values[0], dict) \
+                    and 'type' in values[0]:
+                value = values[0]
+        return parse_polygon_input(key, value)
+    except ValueError as error:
+        raise ValidationError({key: [str(error)]})
@@ -0,0 +1,25 @@
+"""
+Pagination for the service area APIs
+"""
+from django.conf import settings
+
+from rest_framework.pagination import CursorPagination
+
+
+class ServiceAreaCursorPagination(CursorPagination):
+    """
+    Cursor pagination ordered by price then id.
+    Ids only grow, so areas inserted between pages never shift the cursor.
+    """
+    ordering = ('price', 'id')
+    page_size = settings.SERVICEAREA_PAGE_SIZE
+    page_size_query_param = 'limit'
+    max_page_size = settings.SERVICEAREA_MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Return the ordering requested through `order_by`
+        """
+        if view.get_lookup_params()['order_by'] == '-price':
+            return ('-price', '-id')
+        return self.ordering
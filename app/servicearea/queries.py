@@ -0,0 +1,264 @@
+"""
+Set based SQL queries for the service area APIs
+"""
+from django.conf import settings
+from django.contrib.gis.db.models import GeometryField
+from django.contrib.gis.db.models.functions import AsGeoJSON
+from django.contrib.gis.geos import Point
+from django.db import connection
+from django.db.models import (
+    BooleanField,
+    FloatField,
+    Func,
+    OuterRef,
+    Subquery,
+    Value
+)
+from django.db.models.functions import Coalesce
+
+from core.instrumentation import timer
+from core.models import ServiceArea, ServiceAreaPiece, ServiceAreaSimplified
+
+from servicearea.renderers import RawJSON
+from servicearea.spatial_index import spatial_index
+
+
+# Lookup parameter -> ServiceArea filter
+LOOKUP_FILTERS = {
+    'min_price': 'price__gte',
+    'max_price': 'price__lte',
+    'provider': 'provider_id',
+    'currency': 'provider__currency',
+    'language': 'provider__language',
+}
+
+
+def filter_lookup(queryset, params):
+    """
+    Apply the price and provider filters of the validated lookup
+    parameters, so they run in the same query as the spatial predicate
+    """
+    return queryset.filter(**{
+        lookup: params[param]
+        for param, lookup in LOOKUP_FILTERS.items()
+        if params.get(param) is not None
+    })
+
+
+def lookup_queryset(params):
+    """
+    Return the service areas containing the point of the validated
+    lookup parameters, only loading the requested fields
+    """
+    point = Point(params['longitude'], params['latitude'])
+
+    if settings.SERVICEAREA_SPATIAL_INDEX:
+        queryset = ServiceArea.objects.filter(
+            pk__in=spatial_index.lookup(point)
+        )
+    elif settings.SERVICEAREA_GRID_INDEX:
+        queryset = ServiceArea.objects.containing_by_grid(point)
+    else:
+        queryset = ServiceArea.objects.containing(point)
+
+    queryset = filter_lookup(queryset, params).select_related('provider')
+    if 'polygon' not in params['fields']:
+        queryset = queryset.defer('polygon')
+    return queryset
+
+
+def lookup_rows(queryset, params):
+    """
+    Return the lookup queryset as dicts of the columns needed for the
+    requested fields, with the polygon, or its simplified variant,
+    rendered as GeoJSON by the database. Areas without a simplified
+    variant for the zoom, until it's rebuilt, get their full polygon.
+    """
+    fields = params['fields']
+    # The cursor pagination always needs the price and the id
+    columns = ['id', 'price']
+    if 'name' in fields:
+        columns.append('name')
+    if 'provider' in fields:
+        columns.append('provider__name')
+
+    annotations = {}
+    if 'polygon' in fields:
+        polygon = 'polygon'
+        if params['simplify_zoom'] is not None:
+            polygon = Coalesce(
+                Subquery(
+                    ServiceAreaSimplified.objects.filter(
+                        service_area=OuterRef('pk'),
+                        zoom=params['simplify_zoom']
+                    ).values('polygon')
+                ),
+                'polygon'
+            )
+        annotations['polygon_geojson'] = AsGeoJSON(
+            polygon, precision=params['precision']
+        )
+    return queryset.values(*columns, **annotations)
+
+
+class Geography(Func):
+    """
+    Cast of a geometry to geography, measured in meters on the sphere. The
+    polygons cast this way are indexed by core_servicearea_geography_idx.
+    """
+    arity = 1
+    template = '(%(expressions)s)::geography'
+
+
+def geography_of(point):
+    """
+    Return the geography expression of a point
+    """
+    return Geography(Value(point, output_field=GeometryField(srid=point.srid)))
+
+
+class GeographyDistance(Func):
+    """
+    Distance in meters on the sphere between the polygon and the point.
+    Ordering by it is a KNN `<->` scan of the geography GiST index.
+    """
+    arity = 2
+    arg_joiner = ' <-> '
+    template = '(%(expressions)s)'
+    output_field = FloatField()
+
+    def __init__(self, point):
+        super().__init__(Geography('polygon'), geography_of(point))
+
+
+class GeographyDWithin(Func):
+    """
+    Whether the polygon is within `distance` meters on the sphere of the
+    point, matched through the geography GiST index
+    """
+    function = 'ST_DWithin'
+    output_field = BooleanField()
+
+    def __init__(self, point, distance):
+        super().__init__(
+            Geography('polygon'),
+            geography_of(point),
+            Value(distance),
+            Value(False)
+        )
+
+
+def nearest_rows(params):
+    """
+    Return the lookup_rows of the `nearest` service areas closest to the
+    point of the validated lookup parameters within `radius` meters,
+    closest first, with their `distance` in meters on the sphere. The
+    areas containing the point come first, at distance 0.
+    The areas are ranked in meters by the geography GiST index, so the
+    result is exact at any latitude, unlike a KNN scan of the geometry
+    index, which ranks in degrees.
+    """
+    point = Point(params['longitude'], params['latitude'], srid=4326)
+
+    queryset = filter_lookup(ServiceArea.objects.filter(
+        GeographyDWithin(point, params['radius'])
+    ), params)
+    return list(lookup_rows(queryset, params).annotate(
+        distance=GeographyDistance(point)
+    ).order_by('distance', 'id')[:params['nearest']])
+
+
+def format_row(row, fields):
+    """
+    Build the response item of a lookup_rows row, as ServiceAreaSerializer
+    would for the same fields, plus the distance of the nearest_rows
+    """
+    item = {}
+    for field in fields:
+        if field == 'price':
+            item['price'] = str(row['price'])
+        elif field == 'provider':
+            item['provider'] = {'name': row['provider__name']}
+        elif field == 'polygon':
+            item['polygon'] = RawJSON(row['polygon_geojson'])
+        elif field == 'distance':
+            item['distance'] = round(row['distance'], 1)
+        else:
+            item[field] = row[field]
+    return item
+
+
+def lookup_results(params, paginate=None):
+    """
+    Return the response items of the validated lookup parameters, shared
+    by the lookup views: the `nearest` service areas with their distance,
+    or the areas containing the point, either passed through
+    `paginate(rows)` or cut to the first `limit` in the `order_by` order
+    """
+    fields = params['fields']
+    if params.get('nearest') is not None:
+        rows = nearest_rows(params)
+        fields += ('distance',)
+    else:
+        rows = lookup_rows(lookup_queryset(params), params)
+        if paginate is not None:
+            rows = paginate(rows)
+        else:
+            ordering = ('-price', '-id') if params['order_by'] == '-price' \
+                else ('price', 'id')
+            limit = params.get('limit', settings.SERVICEAREA_PAGE_SIZE)
+            rows = rows.order_by(*ordering)[:limit]
+
+    with timer('serialize'):
+        return [format_row(row, fields) for row in rows]
+
+
+def lookup_points(points):
+    """
+    Return, for each (longitude, latitude) point, the list of
+    (id, price, provider_id) of the service areas containing it.
+    All the points are resolved by a single query.
+    """
+    matches = [[] for _ in points]
+    if not points:
+        return matches
+
+    longitudes, latitudes = zip(*points)
+    sql = f"""
+        SELECT DISTINCT point.idx, area.id, area.price, area.provider_id
+        FROM unnest(%s::double precision[], %s::double precision[])
+            WITH ORDINALITY AS point(longitude, latitude, idx)
+        JOIN {ServiceAreaPiece._meta.db_table} AS piece
+            ON ST_Intersects(
+                piece.polygon,
+                ST_SetSRID(ST_MakePoint(point.longitude, point.latitude), 4326)
+            )
+        JOIN {ServiceArea._meta.db_table} AS area
+            ON area.id = piece.service_area_id
+        WHERE point.longitude BETWEEN area.min_lng AND area.max_lng
+            AND point.latitude BETWEEN area.min_lat AND area.max_lat
+        ORDER BY point.idx, area.id
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [list(longitudes), list(latitudes)])
+        for idx, pk, price, provider_id in cursor.fetchall():
+            matches[idx - 1].append((pk, price, provider_id))
+    return matches
+
+
+def lookup_points_with_index(points):
+    """
+    Same as lookup_points, resolving the containment through the
+    in-process spatial index and fetching the rows in one query
+    """
+    ids = [
+        sorted(spatial_index.lookup(Point(longitude, latitude)))
+        for longitude, latitude in points
+    ]
+    rows = {
+        pk: (pk, price, provider_id)
+        for pk, price, provider_id in ServiceArea.objects.filter(
+            pk__in={pk for point_ids in ids for pk in point_ids}
+        ).values_list('id', 'price', 'provider_id')
+    }
+    return [[rows[pk] for pk in point_ids if pk in rows] for point_ids in ids]
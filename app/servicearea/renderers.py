@@ -0,0 +1,64 @@
+"""
+Fast JSON rendering for the service area APIs
+"""
+from decimal import Decimal
+
+import orjson
+from django.utils.functional import Promise
+
+from rest_framework.renderers import BaseRenderer
+
+from core.instrumentation import timer
+
+
+class RawJSON:
+    """
+    JSON text spliced as is into the rendered response
+    """
+
+    def __init__(self, text):
+        self.text = text
+
+    def __eq__(self, other):
+        return isinstance(other, RawJSON) and other.text == self.text
+
+    def __repr__(self):
+        return f'RawJSON({self.text!r})'
+
+
+def default(obj):
+    """
+    Serialize the types orjson doesn't know about
+    """
+    if isinstance(obj, RawJSON):
+        return orjson.Fragment(obj.text)
+    if isinstance(obj, (Decimal, Promise)):
+        return str(obj)
+    raise TypeError(f'Type is not JSON serializable: {type(obj).__name__}')
+
+
+def dumps(data, indent=False):
+    """
+    Render data as JSON bytes
+    """
+    option = orjson.OPT_INDENT_2 if indent else 0
+    return orjson.dumps(data, default=default, option=option)
+
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    Renderer using orjson, splicing RawJSON values without decoding them
+    """
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Render `data` into JSON bytes
+        """
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        with timer('render'):
+            return dumps(data, indent=bool(renderer_context.get('indent')))
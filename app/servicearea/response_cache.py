@@ -0,0 +1,54 @@
+"""
+Cache of the point lookup responses keyed by quantized coordinates
+"""
+import hashlib
+
+from django.conf import settings
+from django.utils.http import urlencode
+
+from core import geohash
+
+from servicearea.versioning import get_version
+
+
+def quantize(latitude, longitude):
+    """
+    Return the geohash cell of the point and the (latitude, longitude) of
+    its center, which every point of the cell is looked up at
+    """
+    cell = geohash.encode(
+        latitude, longitude, settings.SERVICEAREA_RESPONSE_CACHE_PRECISION
+    )
+    return cell, geohash.center(cell)
+
+
+def lookup_cache_key(cell, query_params):
+    """
+    Return the cache key of a lookup, changing with any service area write
+    """
+    params = sorted(
+        (name, value)
+        for name, values in query_params.lists()
+        if name not in ('latitude', 'longitude')
+        for value in values
+    )
+    digest = hashlib.sha1(urlencode(params).encode()).hexdigest()
+    return f'servicearea:lookup:{get_version()}:{cell}:{digest}'
+
+
+def etag_for(cache_key):
+    """
+    Return the ETag of the response cached under the key
+    """
+    return '"%s"' % hashlib.sha1(cache_key.encode()).hexdigest()
+
+
+def etag_matches(etag, if_none_match):
+    """
+    Return whether the If-None-Match header matches the ETag
+    """
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates \
+        or f'W/{etag}' in candidates
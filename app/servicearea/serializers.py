@@ -3,9 +3,16 @@ Serializer for the Service Area model
 """
 from rest_framework import serializers
 
-from core.models import ServiceArea
+from core.models import ServiceArea, ServiceAreaSimplified
+from django.conf import settings
 from django.contrib.auth import get_user_model
 
+from servicearea.geometry import POLYGON_INPUT_KEYS, parse_polygon_input
+
+
+# Fields returned by the point lookup unless others are requested
+LIST_DEFAULT_FIELDS = ('id', 'name', 'price', 'provider')
+
 
 class ProviderSerializer(serializers.ModelSerializer):
     """
@@ -22,6 +29,17 @@ class ServiceAreaSerializer(serializers.ModelSerializer):
     """
     provider = ProviderSerializer(read_only=True)
 
+    def __init__(self, *args, **kwargs):
+        """
+        Accept an optional `fields` argument restricting the output fields
+        """
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
     class Meta:
         """
         Meta class for the Service Area serializer
@@ -30,3 +48,230 @@ class ServiceAreaSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'price', 'provider', 'polygon')
         read_only_fields = ('provider',)
         write_only_fields = ('polygon',)
+        # The polygon may also be sent as a polyline or WKB, see the views
+        extra_kwargs = {'polygon': {'required': False}}
+
+
+class PointSerializer(serializers.Serializer):
+    """
+    Serializer for a (latitude, longitude) point
+    """
+    latitude = serializers.FloatField(min_value=-90, max_value=90)
+    longitude = serializers.FloatField(min_value=-180, max_value=180)
+
+
+class GeometryQuerySerializer(serializers.Serializer):
+    """
+    Serializer for the query parameters shaping the returned polygons
+    """
+    simplify = serializers.FloatField(required=False, min_value=0)
+    zoom = serializers.IntegerField(required=False, min_value=0, max_value=30)
+    precision = serializers.IntegerField(
+        min_value=0,
+        max_value=15,
+        default=settings.SERVICEAREA_GEOJSON_PRECISION
+    )
+
+    def validate(self, attrs):
+        """
+        Resolve `simplify` or `zoom` into the zoom level of the stored
+        simplified polygons to return, None meaning the full polygon.
+        The coarsest variant within the requested tolerance is picked.
+        """
+        if 'simplify' in attrs and 'zoom' in attrs:
+            raise serializers.ValidationError(
+                'Only one of simplify and zoom can be given'
+            )
+        if 'zoom' in attrs:
+            tolerance = ServiceAreaSimplified.tolerance(attrs['zoom'])
+        else:
+            tolerance = attrs.get('simplify', 0)
+
+        attrs['simplify_zoom'] = ServiceAreaSimplified.zoom_within(tolerance)
+        return attrs
+
+
+class LookupQuerySerializer(PointSerializer, GeometryQuerySerializer):
+    """
+    Serializer for the query parameters of the point lookup
+    """
+    fields = serializers.CharField(required=False)
+    include = serializers.CharField(required=False)
+    order_by = serializers.ChoiceField(
+        choices=('price', '-price'),
+        default='price'
+    )
+    min_price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, required=False
+    )
+    max_price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, required=False
+    )
+    provider = serializers.IntegerField(required=False, min_value=1)
+    currency = serializers.CharField(required=False, max_length=3)
+    language = serializers.CharField(required=False, max_length=2)
+    limit = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        max_value=settings.SERVICEAREA_MAX_PAGE_SIZE
+    )
+    # Return the service areas closest to the point instead
+    nearest = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        max_value=settings.SERVICEAREA_NEAREST_MAX
+    )
+    radius = serializers.FloatField(
+        min_value=0,
+        max_value=settings.SERVICEAREA_NEAREST_MAX_RADIUS,
+        default=settings.SERVICEAREA_NEAREST_MAX_RADIUS
+    )
+
+    def validate(self, attrs):
+        """
+        Resolve `fields` and `include` into the tuple of fields to return
+        """
+        attrs = super().validate(attrs)
+        if 'min_price' in attrs and 'max_price' in attrs \
+                and attrs['min_price'] > attrs['max_price']:
+            raise serializers.ValidationError(
+                'min_price must not be greater than max_price'
+            )
+        if 'fields' in attrs:
+            fields = [f for f in attrs['fields'].split(',') if f]
+        else:
+            fields = list(LIST_DEFAULT_FIELDS)
+        if 'include' in attrs:
+            fields += [f for f in attrs['include'].split(',') if f]
+
+        unknown = set(fields) - set(ServiceAreaSerializer.Meta.fields)
+        if unknown:
+            msg = f'Unknown fields: {", ".join(sorted(unknown))}'
+            raise serializers.ValidationError(msg)
+
+        attrs['fields'] = tuple(
+            f for f in ServiceAreaSerializer.Meta.fields if f in fields
+        )
+        return attrs
+
+
+class BatchLookupSerializer(serializers.Serializer):
+    """
+    Serializer for the batch point lookup request
+    """
+    points = serializers.ListField(
+        child=PointSerializer(),
+        allow_empty=False,
+        max_length=settings.SERVICEAREA_BATCH_MAX_POINTS
+    )
+
+
+class ServiceAreaItemSerializer(serializers.Serializer):
+    """
+    Serializer for a service area created through the bulk API
+    """
+    name = serializers.CharField(max_length=255)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    description = serializers.CharField(
+        max_length=255,
+        required=False,
+        allow_blank=True
+    )
+    # List of {"lat", "lng"} vertices or GeoJSON Polygon geometry
+    polygon = serializers.JSONField(required=False)
+    polyline = serializers.CharField(required=False)
+    wkb = serializers.CharField(required=False)
+
+    def validate(self, attrs):
+        """
+        Build the polygon from whichever format it was sent in
+        """
+        keys = [key for key in POLYGON_INPUT_KEYS if key in attrs]
+        if len(keys) > 1:
+            raise serializers.ValidationError(
+                'Send exactly one of polygon, polyline or wkb'
+            )
+        if not keys:
+            if not self.partial:
+                raise serializers.ValidationError(
+                    {'polygon': 'This field is required.'}
+                )
+            return attrs
+
+        key = keys[0]
+        try:
+            attrs['polygon'] = parse_polygon_input(key, attrs.pop(key))
+        except ValueError as error:
+            raise serializers.ValidationError({key: str(error)})
+        return attrs
+
+
+class ServiceAreaUpdateItemSerializer(ServiceAreaItemSerializer):
+    """
+    Serializer for a service area updated through the bulk API,
+    validated with partial=True
+    """
+    id = serializers.IntegerField()
+
+    def validate(self, attrs):
+        """
+        Require the id even on partial validation
+        """
+        if 'id' not in attrs:
+            raise serializers.ValidationError(
+                {'id': 'This field is required.'}
+            )
+        return super().validate(attrs)
+
+
+class BulkServiceAreaSerializer(serializers.Serializer):
+    """
+    Serializer for the bulk service area request
+    """
+    create = serializers.ListField(
+        child=serializers.DictField(),
+        required=False,
+        default=list
+    )
+    update = serializers.ListField(
+        child=serializers.DictField(),
+        required=False,
+        default=list
+    )
+    delete = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        default=list
+    )
+
+    def validate(self, attrs):
+        """
+        Limit the size of the request and validate every item
+        """
+        count = sum(len(attrs[operation]) for operation in attrs)
+        if count > settings.SERVICEAREA_BULK_MAX_ITEMS:
+            raise serializers.ValidationError(
+                f'At most {settings.SERVICEAREA_BULK_MAX_ITEMS} items allowed'
+            )
+
+        errors = {}
+        for operation, item_serializer, partial in (
+            ('create', ServiceAreaItemSerializer, False),
+            ('update', ServiceAreaUpdateItemSerializer, True),
+        ):
+            items = []
+            for index, item in enumerate(attrs[operation]):
+                serializer = item_serializer(data=item, partial=partial)
+                if serializer.is_valid():
+                    items.append(serializer.validated_data)
+                else:
+                    errors.setdefault(operation, {})[index] = serializer.errors
+            attrs[operation] = items
+
+        ids = [item['id'] for item in attrs['update']] + attrs['delete']
+        if len(ids) != len(set(ids)):
+            errors['ids'] = 'A service area can only be changed once'
+
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
@@ -0,0 +1,76 @@
+"""
+Signals for the service area app
+"""
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from core.models import ServiceArea
+from core.routers import remember_write
+from core.signals import service_areas_bulk_changed
+
+from servicearea.tiles import invalidate_tiles, invalidate_all_tiles
+from servicearea.versioning import bump_version
+
+
+def extent_of(service_area):
+    """
+    Return the (min lng, min lat, max lng, max lat) of the service area
+    """
+    return (
+        service_area.min_lng, service_area.min_lat,
+        service_area.max_lng, service_area.max_lat,
+    )
+
+
+@receiver(pre_save, sender=ServiceArea)
+def service_area_saving(sender, instance, update_fields=None, **kwargs):
+    """
+    Remember the extent the service area had, whose tiles become stale
+    """
+    instance._previous_extent = None
+    if instance._state.adding:
+        return
+    if update_fields is not None and 'polygon' not in update_fields:
+        return
+    instance._previous_extent = ServiceArea.objects.filter(
+        pk=instance.pk
+    ).values_list('min_lng', 'min_lat', 'max_lng', 'max_lat').first()
+
+
+@receiver(post_save, sender=ServiceArea)
+@receiver(post_delete, sender=ServiceArea)
+def service_area_changed(sender, instance, **kwargs):
+    """
+    Bump the service area version and evict the tiles of the service area
+    once the write is committed, and have its provider read from the
+    primary for a while
+    """
+    extents = {extent_of(instance)}
+    previous_extent = getattr(instance, '_previous_extent', None)
+    if previous_extent is not None:
+        extents.add(previous_extent)
+
+    transaction.on_commit(bump_version)
+    transaction.on_commit(lambda: invalidate_tiles(extents))
+    transaction.on_commit(lambda: remember_write(instance.provider_id))
+
+
+@receiver(service_areas_bulk_changed, sender=ServiceArea)
+def service_areas_changed_in_bulk(sender, ids, **kwargs):
+    """
+    Bump the service area version and evict every tile once the bulk write
+    is committed, and have the providers read from the primary for a while
+    """
+    provider_ids = set(
+        ServiceArea.objects.filter(id__in=ids)
+        .values_list('provider_id', flat=True)
+    )
+
+    def remember_writes():
+        for provider_id in provider_ids:
+            remember_write(provider_id)
+
+    transaction.on_commit(bump_version)
+    transaction.on_commit(invalidate_all_tiles)
+    transaction.on_commit(remember_writes)
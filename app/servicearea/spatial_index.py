@@ -0,0 +1,151 @@
+"""
+In-process spatial index for service area point lookups
+"""
+import math
+import threading
+
+from django.db import DEFAULT_DB_ALIAS
+
+from core.models import ServiceArea
+
+from servicearea.versioning import get_version
+
+
+NODE_CAPACITY = 16
+
+
+class _Node:
+    """
+    R-tree node, holding either child nodes or (id, prepared polygon) leaves
+    """
+    __slots__ = ('extent', 'children', 'is_leaf')
+
+    def __init__(self, extent, children, is_leaf):
+        self.extent = extent
+        self.children = children
+        self.is_leaf = is_leaf
+
+
+def _merge_extents(extents):
+    """
+    Return the extent covering all the given extents
+    """
+    xmin, ymin, xmax, ymax = zip(*extents)
+    return (min(xmin), min(ymin), max(xmax), max(ymax))
+
+
+def _pack(entries, is_leaf):
+    """
+    Sort-Tile-Recursive packing of (extent, item) entries into nodes
+    """
+    def center_x(entry):
+        return entry[0][0] + entry[0][2]
+
+    def center_y(entry):
+        return entry[0][1] + entry[0][3]
+
+    node_count = math.ceil(len(entries) / NODE_CAPACITY)
+    slab_size = math.ceil(math.sqrt(node_count)) * NODE_CAPACITY
+
+    nodes = []
+    entries = sorted(entries, key=center_x)
+    for slab_start in range(0, len(entries), slab_size):
+        slab = sorted(
+            entries[slab_start:slab_start + slab_size],
+            key=center_y
+        )
+        for start in range(0, len(slab), NODE_CAPACITY):
+            chunk = slab[start:start + NODE_CAPACITY]
+            extent = _merge_extents([entry[0] for entry in chunk])
+            nodes.append(
+                (extent, _Node(extent, [entry[1] for entry in chunk], is_leaf))
+            )
+    return nodes
+
+
+class STRTree:
+    """
+    Static R-tree of prepared polygons answering point-in-polygon queries
+    """
+
+    def __init__(self, polygons):
+        """
+        Build the tree from an iterable of (id, polygon) pairs
+        """
+        entries = [
+            (polygon.extent, (pk, polygon.prepared))
+            for pk, polygon in polygons
+        ]
+        self.size = len(entries)
+        self.root = None
+        if not entries:
+            return
+
+        nodes = _pack(entries, is_leaf=True)
+        while len(nodes) > 1:
+            nodes = _pack(nodes, is_leaf=False)
+        self.root = nodes[0][1]
+
+    def query(self, point):
+        """
+        Return the ids of the polygons covering the point, boundary
+        included, as the pieces matched by ST_Intersects in the database
+        """
+        if self.root is None:
+            return []
+
+        x, y = point.x, point.y
+        matches = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            xmin, ymin, xmax, ymax = node.extent
+            if x < xmin or x > xmax or y < ymin or y > ymax:
+                continue
+            if not node.is_leaf:
+                stack.extend(node.children)
+                continue
+            for pk, prepared in node.children:
+                if prepared.covers(point):
+                    matches.append(pk)
+        return matches
+
+
+class ServiceAreaIndex:
+    """
+    Per-worker index of every service area polygon, rebuilt lazily whenever
+    the shared service area version changes
+    """
+
+    def __init__(self):
+        self.version = None
+        self.tree = None
+        self.lock = threading.Lock()
+
+    def rebuild(self, version):
+        """
+        Load all the polygons and swap in a fresh tree
+        """
+        # Read from the primary: a lagging replica would tie stale polygons
+        # to the new version until the next write
+        polygons = ServiceArea.objects.using(DEFAULT_DB_ALIAS).values_list(
+            'id', 'polygon'
+        ).iterator()
+        self.tree = STRTree(polygons)
+        self.version = version
+
+    def lookup(self, point):
+        """
+        Return the ids of the service areas containing the point
+        """
+        # Read the version before loading so writes made meanwhile are
+        # picked up by the next lookup
+        version = get_version()
+        if version != self.version:
+            with self.lock:
+                if version != self.version:
+                    self.rebuild(version)
+        return self.tree.query(point)
+
+
+spatial_index = ServiceAreaIndex()
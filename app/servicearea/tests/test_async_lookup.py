@@ -0,0 +1,136 @@
+"""
+Test the async service area lookup
+"""
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import Polygon
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+
+from core.models import ServiceArea
+
+from servicearea.async_views import close_executor_connections
+from servicearea.throttling import bucket_store, in_flight
+
+from decimal import Decimal
+
+
+LOOKUP_URL = reverse('servicearea:lookup')
+SERVICEAREA_URL = reverse('servicearea:servicearea-list')
+
+
+class AsyncLookupTests(TransactionTestCase):
+    """
+    Test the async lookup, committing the data so the worker threads
+    running the queries can see it
+    """
+
+    def setUp(self):
+        bucket_store.local.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com',
+            password='Testpass123',
+            name='Test Name',
+        )
+        self.token = Token.objects.create(user=self.user)
+        for price in ('2.00', '1.00'):
+            ServiceArea.objects.create(
+                provider=self.user, name=f'Test Service Area {price}',
+                polygon=Polygon(((0, 0), (0, 1), (1, 1), (1, 0), (0, 0))),
+                price=Decimal(price),
+                description='Test Service'
+            )
+
+    def tearDown(self):
+        # The executor threads keep their connections to the test database
+        # open, which would stop it from being dropped
+        close_executor_connections()
+
+    def test_lookup(self):
+        """
+        Test listing the service areas containing a point
+        """
+        res = self.client.get(
+            LOOKUP_URL,
+            {'latitude': 0.5, 'longitude': 0.5, 'limit': 1},
+            HTTP_AUTHORIZATION=f'Token {self.token.key}'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json(), {'results': [{
+            'id': ServiceArea.objects.get(price=Decimal('1.00')).id,
+            'name': 'Test Service Area 1.00',
+            'price': '1.00',
+            'provider': {'name': 'Test Name'},
+        }]})
+
+    def test_lookup_matches_list(self):
+        """
+        Test the async lookup returns the first page of servicearea-list
+        """
+        for params in (
+            {},
+            {'order_by': '-price', 'include': 'polygon'},
+            {'fields': 'id,price', 'min_price': '1.50'},
+            {'nearest': 5, 'radius': 1000},
+        ):
+            params = {'latitude': 0.5, 'longitude': 0.5, **params}
+            with self.subTest(params=params):
+                listed = self.client.get(
+                    SERVICEAREA_URL, params,
+                    HTTP_AUTHORIZATION=f'Token {self.token.key}'
+                )
+                looked_up = self.client.get(
+                    LOOKUP_URL, params,
+                    HTTP_AUTHORIZATION=f'Token {self.token.key}'
+                )
+
+                self.assertEqual(looked_up.status_code, status.HTTP_200_OK)
+                self.assertEqual(
+                    looked_up.json()['results'], listed.json()['results']
+                )
+
+    def test_lookup_requires_token(self):
+        """
+        Test the lookup rejects unauthenticated requests
+        """
+        res = self.client.get(LOOKUP_URL, {'latitude': 0.5, 'longitude': 0.5})
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        res = self.client.get(
+            LOOKUP_URL,
+            {'latitude': 0.5, 'longitude': 0.5},
+            HTTP_AUTHORIZATION='Token invalid'
+        )
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_lookup_invalid_params(self):
+        """
+        Test the lookup validates its parameters
+        """
+        res = self.client.get(
+            LOOKUP_URL,
+            {'latitude': 'north'},
+            HTTP_AUTHORIZATION=f'Token {self.token.key}'
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(SERVICEAREA_THROTTLE_RATE=0.001,
+                       SERVICEAREA_THROTTLE_BURST=1,
+                       SERVICEAREA_MAX_IN_FLIGHT=1)
+    def test_throttled_lookup_not_in_flight(self):
+        """
+        Test a throttled lookup gets its 429 without taking a slot
+        """
+        self.assertTrue(in_flight.acquire())
+        self.addCleanup(in_flight.release)
+        params = {'latitude': 0.5, 'longitude': 0.5}
+
+        res = self.client.get(LOOKUP_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        res = self.client.get(LOOKUP_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(in_flight.count, 1)
@@ -0,0 +1,81 @@
+"""
+Test the parsing of the polygons sent to the APIs
+"""
+import base64
+
+from django.test import SimpleTestCase
+from django.contrib.gis.geos import Polygon
+
+from servicearea.geometry import (
+    decode_polyline,
+    parse_geojson,
+    parse_polygon,
+    parse_polyline,
+    parse_wkb
+)
+
+
+class GeometryParsingTests(SimpleTestCase):
+    """
+    Test the parsing of the polygons sent to the APIs
+    """
+
+    def test_parse_polygon_axis_order(self):
+        """
+        Test the legacy vertices are read as (longitude, latitude)
+        """
+        polygon = parse_polygon([
+            {'lat': '1', 'lng': '10'},
+            {'lat': '1', 'lng': '11'},
+            {'lat': '2', 'lng': '11'},
+        ])
+
+        self.assertEqual(polygon.extent, (10, 1, 11, 2))
+
+    def test_parse_geojson(self):
+        """
+        Test parsing a GeoJSON Polygon geometry
+        """
+        polygon = parse_geojson({
+            'type': 'Polygon',
+            'coordinates': [[[10, 1], [11, 1], [11, 2], [10, 2], [10, 1]]],
+        })
+
+        self.assertEqual(polygon.extent, (10, 1, 11, 2))
+        with self.assertRaises(ValueError):
+            parse_geojson({'type': 'Point', 'coordinates': [10, 1]})
+        with self.assertRaises(ValueError):
+            parse_geojson({'type': 'Polygon', 'coordinates': [[10, 1]]})
+
+    def test_decode_polyline(self):
+        """
+        Test decoding the reference polyline
+        """
+        self.assertEqual(
+            decode_polyline('_p~iF~ps|U_ulLnnqC_mqNvxq`@'),
+            [(-120.2, 38.5), (-120.95, 40.7), (-126.453, 43.252)]
+        )
+        with self.assertRaises(ValueError):
+            decode_polyline('_p~iF~ps|U_')
+
+    def test_parse_polyline(self):
+        """
+        Test a polyline is read as the closed exterior ring
+        """
+        polygon = parse_polyline('_p~iF~ps|U_ulLnnqC_mqNvxq`@')
+
+        self.assertEqual(polygon.num_points, 4)
+        self.assertEqual(polygon.extent, (-126.453, 38.5, -120.2, 43.252))
+
+    def test_parse_wkb(self):
+        """
+        Test parsing base64 encoded WKB
+        """
+        square = Polygon(((10, 1), (11, 1), (11, 2), (10, 2), (10, 1)))
+
+        polygon = parse_wkb(base64.b64encode(bytes(square.wkb)).decode())
+
+        self.assertEqual(polygon.extent, (10, 1, 11, 2))
+        self.assertEqual(polygon.srid, 4326)
+        with self.assertRaises(ValueError):
+            parse_wkb('not base64!')
@@ -1,7 +1,9 @@
 """
 Test Service Area API
 """
-from django.test import TestCase
+import base64
+
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.contrib.gis.geos import Polygon, Point
@@ -9,14 +11,19 @@ from django.contrib.gis.geos import Polygon, Point
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import ServiceArea
+from core.models import ServiceArea, ServiceAreaSimplified
 
-from servicearea.serializers import ServiceAreaSerializer
+from servicearea.serializers import (
+    ServiceAreaSerializer,
+    LIST_DEFAULT_FIELDS
+)
 
 from decimal import Decimal
 
 
 SERVICEAREA_URL = reverse('servicearea:servicearea-list')
+BATCH_LOOKUP_URL = reverse('servicearea:lookup-batch')
+BULK_URL = reverse('servicearea:servicearea-bulk')
 
 
 def detail_url(servicearea_id):
@@ -98,10 +105,264 @@ class PrivateServiceAreaApiTests(TestCase):
         )
 
         service_areas = ServiceArea.objects.filter(polygon__contains=lat_lng).all()
-        serializer = ServiceAreaSerializer(service_areas, many=True)
+        serializer = ServiceAreaSerializer(
+            service_areas, many=True, fields=LIST_DEFAULT_FIELDS
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], serializer.data)
+
+    def test_retrieve_service_areas_include_polygon(self):
+        """
+        Test the polygon is only returned when requested
+        """
+        create_servicearea(
+            self.user, name='Test Service Area 1',
+            polygon=Polygon(((0, 0), (0, 1), (1, 1), (1, 0), (0, 0))),
+            price=Decimal('1.00'),
+            description='Test Service 1'
+        )
+        params = {'latitude': 0.5, 'longitude': 0.5}
+
+        res = self.client.get(SERVICEAREA_URL, params)
+        self.assertNotIn('polygon', res.data['results'][0])
+
+        params['include'] = 'polygon'
+        res = self.client.get(SERVICEAREA_URL, params)
+        self.assertIn('polygon', res.data['results'][0])
+
+        params['fields'] = 'id,price'
+        del params['include']
+        res = self.client.get(SERVICEAREA_URL, params)
+        self.assertEqual(set(res.data['results'][0]), {'id', 'price'})
+
+        params['fields'] = 'secret'
+        res = self.client.get(SERVICEAREA_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_retrieve_service_areas_polygon_geojson(self):
+        """
+        Test the polygon is returned as GeoJSON with the requested precision
+        """
+        create_servicearea(
+            self.user, name='Test Service Area 1',
+            polygon=Polygon(
+                ((0, 0), (0, 1.123456789), (1, 1), (1, 0), (0, 0))
+            ),
+            price=Decimal('1.00'),
+            description='Test Service 1'
+        )
+
+        res = self.client.get(SERVICEAREA_URL, {
+            'latitude': 0.5, 'longitude': 0.5,
+            'fields': 'id,polygon', 'precision': 3
+        })
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        polygon = res.json()['results'][0]['polygon']
+        self.assertEqual(polygon['type'], 'Polygon')
+        self.assertEqual(polygon['coordinates'][0][1], [0, 1.123])
+
+    def test_retrieve_service_areas_constant_queries(self):
+        """
+        Test listing service areas does not issue a query per result
+        """
+        params = {'latitude': 0.5, 'longitude': 0.5}
+        for count in (1, 5):
+            for i in range(count):
+                provider = create_user(
+                    email=f'provider{count}-{i}@test.com',
+                    password='Testpass123',
+                    name=f'Provider {i}',
+                )
+                create_servicearea(
+                    provider, name=f'Test Service Area {i}',
+                    polygon=Polygon(((0, 0), (0, 1), (1, 1), (1, 0), (0, 0))),
+                    price=Decimal('1.00'),
+                    description='Test Service'
+                )
+
+            with self.assertNumQueries(1):
+                res = self.client.get(SERVICEAREA_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_service_areas_paginated(self):
+        """
+        Test paging through service areas cheapest first
+        """
+        for price in ('3.00', '1.00', '2.00'):
+            create_servicearea(
+                self.user, name=f'Test Service Area {price}',
+                polygon=Polygon(((0, 0), (0, 1), (1, 1), (1, 0), (0, 0))),
+                price=Decimal(price),
+                description='Test Service'
+            )
+
+        res = self.client.get(
+            SERVICEAREA_URL, {'latitude': 0.5, 'longitude': 0.5, 'limit': 2}
+        )
+        self.assertEqual(
+            [area['price'] for area in res.data['results']],
+            ['1.00', '2.00']
+        )
+
+        res = self.client.get(res.data['next'])
+        self.assertEqual(
+            [area['price'] for area in res.data['results']],
+            ['3.00']
+        )
+        self.assertIsNone(res.data['next'])
+
+        res = self.client.get(
+            SERVICEAREA_URL,
+            {'latitude': 0.5, 'longitude': 0.5, 'order_by': '-price'}
+        )
+        self.assertEqual(
+            [area['price'] for area in res.data['results']],
+            ['3.00', '2.00', '1.00']
+        )
+
+    def test_retrieve_service_areas_missing_coordinates(self):
+        """
+        Test the lookup requires a latitude and a longitude
+        """
+        res = self.client.get(SERVICEAREA_URL, {'latitude': 0.5})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_retrieve_service_areas_filtered(self):
+        """
+        Test filtering the lookup by price and provider
+        """
+        other = create_user(
+            email='other@test.com',
+            password='Testpass123',
+            name='Other Name',
+            language='fr',
+            currency='EUR'
+        )
+        polygon = Polygon(((0, 0), (0, 1), (1, 1), (1, 0), (0, 0)))
+        areas = {
+            (provider.email, price): create_servicearea(
+                provider, name=f'Test Service Area {price}',
+                polygon=polygon,
+                price=Decimal(price),
+                description='Test Service'
+            )
+            for provider in (self.user, other)
+            for price in ('1.00', '2.00', '3.00')
+        }
+        params = {'latitude': 0.5, 'longitude': 0.5}
+
+        def lookup(**filters):
+            res = self.client.get(SERVICEAREA_URL, {**params, **filters})
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            return [area['id'] for area in res.data['results']]
+
+        self.assertEqual(
+            lookup(min_price='2.00', max_price='2.50'),
+            [areas[('test@test.com', '2.00')].id,
+             areas[('other@test.com', '2.00')].id]
+        )
+        self.assertEqual(
+            lookup(provider=other.id, max_price='2.00'),
+            [areas[('other@test.com', '1.00')].id,
+             areas[('other@test.com', '2.00')].id]
+        )
+        self.assertEqual(
+            lookup(currency='EUR', order_by='-price'),
+            [areas[('other@test.com', price)].id
+             for price in ('3.00', '2.00', '1.00')]
+        )
+        self.assertEqual(
+            lookup(language='en', min_price='3.00'),
+            [areas[('test@test.com', '3.00')].id]
+        )
+
+        res = self.client.get(
+            SERVICEAREA_URL, {**params, 'min_price': '3', 'max_price': '1'}
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_retrieve_nearest_service_areas(self):
+        """
+        Test the nearest lookup returns the closest service areas within
+        the radius, closest first, with their distance in meters
+        """
+        inner = create_servicearea(
+            self.user, name='Test Service Area 1',
+            polygon=Polygon(((0, 0), (0, 1), (1, 1), (1, 0), (0, 0))),
+            price=Decimal('2.00'),
+            description='Test Service 1'
+        )
+        outer = create_servicearea(
+            self.user, name='Test Service Area 2',
+            polygon=Polygon(((2, 0), (2, 1), (3, 1), (3, 0), (2, 0))),
+            price=Decimal('1.00'),
+            description='Test Service 2'
+        )
+        create_servicearea(
+            self.user, name='Test Service Area 3',
+            polygon=Polygon(((10, 10), (10, 11), (11, 11), (11, 10),
+                             (10, 10))),
+            price=Decimal('1.00'),
+            description='Test Service 3'
+        )
+        params = {
+            'latitude': 0.5, 'longitude': 1.4,
+            'nearest': 5, 'radius': 100000
+        }
+
+        res = self.client.get(SERVICEAREA_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        results = res.data['results']
+        self.assertEqual(
+            [area['id'] for area in results], [inner.id, outer.id]
+        )
+        self.assertAlmostEqual(results[0]['distance'], 44478, delta=100)
+        self.assertAlmostEqual(results[1]['distance'], 66717, delta=100)
+
+        res = self.client.get(SERVICEAREA_URL, {**params, 'nearest': 1})
+        self.assertEqual([area['id'] for area in res.data['results']],
+                         [inner.id])
+
+        res = self.client.get(SERVICEAREA_URL, {**params, 'longitude': 0.5})
+        self.assertEqual(res.data['results'][0]['distance'], 0)
+
+        res = self.client.get(SERVICEAREA_URL, {**params, 'radius': 10 ** 9})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_retrieve_nearest_service_areas_high_latitude(self):
+        """
+        Test the nearest service areas are ranked in meters where a degree
+        of longitude is much shorter than a degree of latitude
+        """
+        east = create_servicearea(
+            self.user, name='East',
+            polygon=Polygon.from_bbox((0.5, 59.95, 0.6, 60.05)),
+            price=Decimal('1.00'),
+            description='About 28km away'
+        )
+        # Closer in degrees, but 33km to 49km away
+        for i in range(8):
+            create_servicearea(
+                self.user, name=f'North {i}',
+                polygon=Polygon.from_bbox(
+                    (-0.05, 60.3 + i * 0.02, 0.05, 60.31 + i * 0.02)
+                ),
+                price=Decimal('1.00'),
+                description='Farther north'
+            )
+
+        res = self.client.get(SERVICEAREA_URL, {
+            'latitude': 60, 'longitude': 0, 'nearest': 1, 'radius': 50000
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        results = res.data['results']
+        self.assertEqual([area['id'] for area in results], [east.id])
+        self.assertAlmostEqual(results[0]['distance'], 27798, delta=100)
 
     def test_create_service_area_successful(self):
         """
@@ -125,6 +386,81 @@ class PrivateServiceAreaApiTests(TestCase):
         self.assertEqual(res.data.get('provider').get('name'), self.user.name)
         self.assertEqual(res.status_code, status.HTTP_201_CREATED)
 
+    def test_create_service_area_normalized_polygon(self):
+        """
+        Test the polygon is cleaned up before being stored
+        """
+        payload = {
+            'name': 'Test Service Area',
+            'polygon': [
+                {'lat': 0, 'lng': 0},
+                {'lat': 0, 'lng': 1},
+                {'lat': 0, 'lng': 1},
+                {'lat': 1, 'lng': 1},
+                {'lat': 1, 'lng': 0},
+            ],
+            'price': Decimal('1.00'),
+            'description': 'Test Service'
+        }
+
+        res = self.client.post(SERVICEAREA_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        service_area = ServiceArea.objects.get()
+        self.assertEqual(service_area.vertex_count, 5)
+        self.assertEqual(service_area.area, 1)
+        self.assertTrue(service_area.polygon.exterior_ring.is_counterclockwise)
+
+    def test_create_service_area_compact_formats(self):
+        """
+        Test creating service areas from GeoJSON, polyline and WKB, found
+        by a lookup at their (longitude, latitude)
+        """
+        square = Polygon(((10, 1), (11, 1), (11, 2), (10, 2), (10, 1)))
+        payloads = (
+            {'polygon': {
+                'type': 'Polygon', 'coordinates': [list(square.coords[0])]
+            }},
+            {'polyline': '_ibE_c`|@?_ibE_ibE?'},
+            {'wkb': base64.b64encode(bytes(square.wkb)).decode()},
+        )
+        for payload in payloads:
+            res = self.client.post(SERVICEAREA_URL, {
+                'name': 'Test Service Area',
+                'price': '1.00',
+                'description': 'Test Service',
+                **payload,
+            }, format='json')
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        res = self.client.get(
+            SERVICEAREA_URL, {'latitude': 1.3, 'longitude': 10.7}
+        )
+        self.assertEqual(len(res.data['results']), 3)
+
+    def test_create_service_area_invalid_polygon(self):
+        """
+        Test a self intersecting polygon is rejected
+        """
+        payload = {
+            'name': 'Test Service Area',
+            'polygon': [
+                {'lat': 0, 'lng': 0},
+                {'lat': 1, 'lng': 1},
+                {'lat': 1, 'lng': 0},
+                {'lat': 0, 'lng': 1},
+                {'lat': 0, 'lng': 0},
+            ],
+            'price': Decimal('1.00'),
+            'description': 'Test Service'
+        }
+
+        res = self.client.post(SERVICEAREA_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('polygon', res.data)
+        self.assertFalse(ServiceArea.objects.exists())
+
     def test_update_service_area(self):
         """
         Test updating a service area
@@ -199,3 +535,262 @@ class PrivateServiceAreaApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(ServiceArea.objects.count(), 0)
+
+    def test_retrieve_service_area_simplified(self):
+        """
+        Test retrieving a service area with a polygon simplified for a zoom
+        """
+        service_area = create_servicearea(
+            self.user, name='Test Service Area',
+            polygon=Point(0, 0).buffer(10, quadsegs=256),
+            price=Decimal('1.00'),
+            description='Test Service'
+        )
+
+        res = self.client.get(detail_url(service_area.id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['name'], 'Test Service Area')
+        full = res.json()['polygon']['coordinates'][0]
+
+        res = self.client.get(detail_url(service_area.id), {'zoom': 4})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        simplified = res.json()['polygon']['coordinates'][0]
+        self.assertLess(len(simplified), len(full))
+
+        res = self.client.get(
+            detail_url(service_area.id), {'zoom': 4, 'simplify': 0.1}
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_retrieve_service_areas_simplified(self):
+        """
+        Test listing service areas with simplified polygons
+        """
+        create_servicearea(
+            self.user, name='Test Service Area',
+            polygon=Point(0, 0).buffer(10, quadsegs=256),
+            price=Decimal('1.00'),
+            description='Test Service'
+        )
+        params = {'latitude': 0, 'longitude': 0, 'include': 'polygon'}
+
+        res = self.client.get(SERVICEAREA_URL, params)
+        full = res.json()['results'][0]['polygon']['coordinates'][0]
+
+        res = self.client.get(SERVICEAREA_URL, {**params, 'simplify': 0.1})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        simplified = res.json()['results'][0]['polygon']['coordinates'][0]
+        self.assertLess(len(simplified), len(full))
+
+    def test_retrieve_service_areas_simplified_missing(self):
+        """
+        Test listing simplified polygons of an area without simplified
+        variants returns its full polygon
+        """
+        service_area = create_servicearea(
+            self.user, name='Test Service Area',
+            polygon=Point(0, 0).buffer(10, quadsegs=256),
+            price=Decimal('1.00'),
+            description='Test Service'
+        )
+        ServiceAreaSimplified.objects.filter(
+            service_area=service_area
+        ).delete()
+        params = {'latitude': 0, 'longitude': 0, 'include': 'polygon'}
+
+        res = self.client.get(SERVICEAREA_URL, {**params, 'simplify': 0.1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        polygon = res.json()['results'][0]['polygon']['coordinates'][0]
+        self.assertEqual(len(polygon), len(service_area.polygon.coords[0]))
+
+    def test_batch_lookup(self):
+        """
+        Test resolving the service areas of many points in one request
+        """
+        small = create_servicearea(
+            self.user, name='Test Service Area 1',
+            polygon=Polygon(((0, 0), (0, 1), (1, 1), (1, 0), (0, 0))),
+            price=Decimal('1.00'),
+            description='Test Service 1'
+        )
+        big = create_servicearea(
+            self.user, name='Test Service Area 2',
+            polygon=Polygon(((0, 0), (0, 2), (2, 2), (2, 0), (0, 0))),
+            price=Decimal('2.00'),
+            description='Test Service 2'
+        )
+
+        payload = {
+            'points': [
+                {'latitude': 0.5, 'longitude': 0.5},
+                {'latitude': 1.5, 'longitude': 0.5},
+                {'latitude': 50, 'longitude': 50},
+            ]
+        }
+        res = self.client.post(BATCH_LOOKUP_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        results = res.data['results']
+        self.assertEqual(len(results), 3)
+        self.assertEqual(
+            [area['id'] for area in results[0]['service_areas']],
+            [small.id, big.id]
+        )
+        self.assertEqual(results[1]['service_areas'], [{
+            'id': big.id, 'price': '2.00', 'provider': self.user.id
+        }])
+        self.assertEqual(results[2]['service_areas'], [])
+
+    def test_batch_lookup_invalid_point(self):
+        """
+        Test the batch lookup rejects out of range coordinates
+        """
+        payload = {'points': [{'latitude': 100, 'longitude': 0}]}
+        res = self.client.post(BATCH_LOOKUP_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_service_areas(self):
+        """
+        Test creating, updating and deleting service areas in one request
+        """
+        polygon = Polygon(((0, 0), (0, 1), (1, 1), (1, 0), (0, 0)))
+        updated = create_servicearea(
+            self.user, name='Updated', polygon=polygon,
+            price=Decimal('1.00'), description='Test Service'
+        )
+        deleted = create_servicearea(
+            self.user, name='Deleted', polygon=polygon,
+            price=Decimal('1.00'), description='Test Service'
+        )
+        vertices = [
+            {'lat': 5, 'lng': 5},
+            {'lat': 5, 'lng': 6},
+            {'lat': 6, 'lng': 6},
+            {'lat': 6, 'lng': 5},
+            {'lat': 5, 'lng': 5},
+        ]
+        payload = {
+            'create': [
+                {'name': 'Created', 'price': '3.00', 'polygon': vertices},
+            ],
+            'update': [
+                {'id': updated.id, 'price': '2.00', 'polygon': vertices},
+            ],
+            'delete': [deleted.id],
+        }
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        created = ServiceArea.objects.get(name='Created')
+        self.assertEqual(res.data['create'], [
+            {'id': created.id, 'status': 'created'}
+        ])
+        self.assertEqual(created.provider, self.user)
+        updated.refresh_from_db()
+        self.assertEqual(updated.price, Decimal('2.00'))
+        self.assertEqual(updated.min_lng, 5)
+        self.assertFalse(ServiceArea.objects.filter(id=deleted.id).exists())
+
+    def test_bulk_service_areas_atomic(self):
+        """
+        Test nothing is applied when one item is invalid
+        """
+        user2 = create_user(email='test2@test.com', password='Testpass123')
+        other = create_servicearea(
+            user2, name='Other',
+            polygon=Polygon(((0, 0), (0, 1), (1, 1), (1, 0), (0, 0))),
+            price=Decimal('1.00'), description='Test Service'
+        )
+        payload = {
+            'create': [{
+                'name': 'Created', 'price': '3.00',
+                'polygon': [{'lat': 0, 'lng': 0}, {'lat': 1, 'lng': 1}],
+            }],
+        }
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('polygon', res.data['create'][0])
+
+        res = self.client.post(BULK_URL, {'delete': [other.id]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(ServiceArea.objects.filter(id=other.id).exists())
+
+
+@override_settings(SERVICEAREA_RESPONSE_CACHE=True)
+class CachedServiceAreaApiTests(TestCase):
+    """
+    Test the cached service area lookup
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email='test@test.com',
+            password='Testpass123',
+            name='Test Name',
+        )
+        self.client.force_authenticate(self.user)
+        self.params = {'latitude': 0.5, 'longitude': 0.5}
+
+    def create_servicearea(self, price):
+        """
+        Create a service area and run the on commit hooks
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            return create_servicearea(
+                self.user, name='Test Service Area',
+                polygon=Polygon(((0, 0), (0, 1), (1, 1), (1, 0), (0, 0))),
+                price=Decimal(price),
+                description='Test Service'
+            )
+
+    def test_not_modified(self):
+        """
+        Test a lookup matching the client ETag is not resent
+        """
+        self.create_servicearea('1.00')
+        res = self.client.get(SERVICEAREA_URL, self.params)
+        etag = res['ETag']
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+
+        res = self.client.get(
+            SERVICEAREA_URL, self.params, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_nearby_points_share_cache(self):
+        """
+        Test points in the same cell are served from the cache
+        """
+        self.create_servicearea('1.00')
+        self.client.get(SERVICEAREA_URL, self.params)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(
+                SERVICEAREA_URL, {'latitude': 0.500001, 'longitude': 0.5}
+            )
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_write_invalidates_cache(self):
+        """
+        Test a service area write changes the ETag and the results
+        """
+        self.create_servicearea('1.00')
+        etag = self.client.get(SERVICEAREA_URL, self.params)['ETag']
+
+        self.create_servicearea('2.00')
+        res = self.client.get(
+            SERVICEAREA_URL, self.params, HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        self.assertEqual(len(res.data['results']), 2)
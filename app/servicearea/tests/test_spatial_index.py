@@ -0,0 +1,167 @@
+"""
+Test the in-process service area spatial index
+"""
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import Polygon, Point
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ServiceArea
+
+from servicearea.spatial_index import ServiceAreaIndex, STRTree
+
+from decimal import Decimal
+
+
+SERVICEAREA_URL = reverse('servicearea:servicearea-list')
+BATCH_LOOKUP_URL = reverse('servicearea:lookup-batch')
+
+
+def create_user(**params):
+    """
+    Create a user
+    """
+    return get_user_model().objects.create_user(**params)
+
+
+def square(x, y, size=1):
+    """
+    Return a square polygon with its lower left corner at (x, y)
+    """
+    return Polygon((
+        (x, y), (x, y + size), (x + size, y + size), (x + size, y), (x, y)
+    ))
+
+
+class STRTreeTests(TestCase):
+    """
+    Test the R-tree used by the spatial index
+    """
+
+    def test_query_matches_containing_polygons(self):
+        """
+        Test the tree returns exactly the polygons containing the point
+        """
+        polygons = [(i, square(i, i, 2)) for i in range(100)]
+        tree = STRTree(polygons)
+
+        self.assertEqual(sorted(tree.query(Point(10.5, 10.5))), [9, 10])
+        self.assertEqual(tree.query(Point(0.5, 1.5)), [0])
+        self.assertEqual(tree.query(Point(-5, -5)), [])
+
+    def test_query_matches_boundary(self):
+        """
+        Test points on the boundary of a polygon match it
+        """
+        tree = STRTree([(0, square(0, 0))])
+
+        self.assertEqual(tree.query(Point(1, 0.5)), [0])
+        self.assertEqual(tree.query(Point(0, 0)), [0])
+        self.assertEqual(tree.query(Point(1.01, 0.5)), [])
+
+    def test_empty_tree(self):
+        """
+        Test querying a tree without polygons
+        """
+        self.assertEqual(STRTree([]).query(Point(0, 0)), [])
+
+
+class ServiceAreaIndexTests(TestCase):
+    """
+    Test the versioned service area index
+    """
+
+    def setUp(self):
+        self.user = create_user(
+            email='test@test.com',
+            password='Testpass123',
+            name='Test Name',
+            phone_number='+123456789',
+            language='en',
+            currency='USD'
+        )
+
+    def create_servicearea(self, polygon):
+        """
+        Create a service area and run the on commit hooks
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            return ServiceArea.objects.create(
+                provider=self.user,
+                name='Test Service Area',
+                polygon=polygon,
+                price=Decimal('1.00'),
+                description='Test Service'
+            )
+
+    def test_index_rebuilt_after_write(self):
+        """
+        Test the index sees areas created and deleted after it was built
+        """
+        index = ServiceAreaIndex()
+        first = self.create_servicearea(square(0, 0))
+        self.assertEqual(index.lookup(Point(0.5, 0.5)), [first.id])
+
+        second = self.create_servicearea(square(0, 0, 2))
+        self.assertEqual(
+            sorted(index.lookup(Point(0.5, 0.5))),
+            [first.id, second.id]
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(index.lookup(Point(0.5, 0.5)), [second.id])
+
+    @override_settings(SERVICEAREA_SPATIAL_INDEX=True)
+    def test_list_uses_index(self):
+        """
+        Test listing service areas through the index
+        """
+        self.create_servicearea(square(0, 0))
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        res = client.get(SERVICEAREA_URL, {'latitude': 0.5, 'longitude': 0.5})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_boundary_point_on_every_path(self):
+        """
+        Test a point on the boundary matches whichever way lookups are
+        answered
+        """
+        client = APIClient()
+        client.force_authenticate(self.user)
+        point = {'latitude': 0.5, 'longitude': 1}
+
+        for options in (
+            {},
+            {'SERVICEAREA_SPATIAL_INDEX': True},
+            {'SERVICEAREA_GRID_INDEX': True},
+        ):
+            with self.subTest(**options), self.settings(**options):
+                service_area = self.create_servicearea(square(0, 0))
+
+                res = client.get(SERVICEAREA_URL, point)
+                self.assertEqual(
+                    [item['id'] for item in res.data['results']],
+                    [service_area.id]
+                )
+
+                res = client.post(
+                    BATCH_LOOKUP_URL, {'points': [point]}, format='json'
+                )
+                self.assertEqual(
+                    [
+                        item['id']
+                        for item in res.data['results'][0]['service_areas']
+                    ],
+                    [service_area.id]
+                )
+
+                with self.captureOnCommitCallbacks(execute=True):
+                    service_area.delete()
@@ -0,0 +1,155 @@
+"""
+Test the throttling and load shedding of the lookups
+"""
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.client import RequestFactory
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import token_cache
+
+from servicearea.throttling import (
+    TokenBucketThrottle,
+    bucket_store,
+    in_flight
+)
+
+
+SERVICEAREA_URL = reverse('servicearea:servicearea-list')
+
+
+@override_settings(SERVICEAREA_THROTTLE_RATE=2, SERVICEAREA_THROTTLE_BURST=3)
+class TokenBucketThrottleTests(SimpleTestCase):
+    """Test the token buckets"""
+
+    def setUp(self):
+        bucket_store.local.clear()
+        token_cache.local.clear()
+        self.addCleanup(token_cache.local.clear)
+        token_cache.local.set('abc', SimpleNamespace(user_id=1, user=None))
+        token_cache.local.set('other', SimpleNamespace(user_id=2, user=None))
+        self.factory = RequestFactory()
+
+    def request(self, token='abc'):
+        """Return a request authenticated with the token"""
+        return self.factory.get('/', HTTP_AUTHORIZATION=f'Token {token}')
+
+    def allow(self, request, scope='lookup'):
+        """Return whether the request is allowed and its wait"""
+        throttle = TokenBucketThrottle(scope)
+        return throttle.allow_request(request, None), throttle.wait()
+
+    @patch('servicearea.throttling.time.time')
+    def test_burst_then_refill(self, now):
+        """Test the bucket allows a burst, then refills over time"""
+        now.return_value = 1000.0
+        for _ in range(3):
+            self.assertEqual(self.allow(self.request()), (True, None))
+
+        allowed, wait = self.allow(self.request())
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 0.5)
+
+        now.return_value = 1000.5
+        self.assertTrue(self.allow(self.request())[0])
+        self.assertFalse(self.allow(self.request())[0])
+
+    def test_buckets_per_user_and_scope(self):
+        """Test every provider and endpoint has its own bucket"""
+        for _ in range(3):
+            self.allow(self.request())
+
+        self.assertFalse(self.allow(self.request())[0])
+        self.assertTrue(self.allow(self.request('other'))[0])
+        self.assertTrue(self.allow(self.request(), 'batch')[0])
+        self.assertTrue(self.allow(self.factory.get('/'))[0])
+
+    def test_unknown_tokens_share_address_bucket(self):
+        """Test made up tokens are throttled by client address"""
+        for index in range(3):
+            self.assertTrue(self.allow(self.request(f'made-up-{index}'))[0])
+
+        self.assertFalse(self.allow(self.request('made-up-3'))[0])
+        self.assertFalse(self.allow(self.factory.get('/'))[0])
+        self.assertTrue(self.allow(self.request())[0])
+
+    @override_settings(SERVICEAREA_THROTTLE_RATE=0)
+    def test_disabled(self):
+        """Test requests are not throttled without a rate"""
+        for _ in range(10):
+            self.assertTrue(self.allow(self.request())[0])
+
+
+class ThrottledLookupApiTests(TestCase):
+    """Test the lookup endpoint is protected before any query"""
+
+    def setUp(self):
+        bucket_store.local.clear()
+        token_cache.local.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com',
+            password='Testpass123',
+            name='Test Name',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.params = {'latitude': 0.5, 'longitude': 0.5}
+
+    @override_settings(SERVICEAREA_THROTTLE_RATE=0.1,
+                       SERVICEAREA_THROTTLE_BURST=1)
+    def test_throttled(self):
+        """Test an exhausted bucket gets a 429 without querying"""
+        # The first request, before the token is cached, is counted in the
+        # bucket of the client address, the next ones in the provider's
+        for _ in range(2):
+            res = self.client.get(SERVICEAREA_URL, self.params)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(SERVICEAREA_URL, self.params)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '10')
+
+    @override_settings(SERVICEAREA_MAX_IN_FLIGHT=1)
+    def test_load_shedding(self):
+        """Test lookups get a 503 while too many are running"""
+        self.assertTrue(in_flight.acquire())
+        self.addCleanup(in_flight.release)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(SERVICEAREA_URL, self.params)
+
+        self.assertEqual(
+            res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+        self.assertEqual(res['Retry-After'], '1')
+
+    @override_settings(SERVICEAREA_MAX_IN_FLIGHT=1)
+    def test_lookups_counted_out(self):
+        """Test finished lookups no longer count as running"""
+        for _ in range(2):
+            res = self.client.get(SERVICEAREA_URL, self.params)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(in_flight.count, 0)
+
+    @override_settings(SERVICEAREA_MAX_IN_FLIGHT=1)
+    def test_failed_lookup_counted_out(self):
+        """Test a lookup failing with an unhandled error is counted out"""
+        with patch(
+            'servicearea.queries.lookup_rows', side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                self.client.get(SERVICEAREA_URL, self.params)
+
+        self.assertEqual(in_flight.count, 0)
+        res = self.client.get(SERVICEAREA_URL, self.params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
@@ -0,0 +1,131 @@
+"""
+Test the service area vector tiles
+"""
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import Polygon
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ServiceArea
+
+from servicearea.tiles import tile_range
+
+from decimal import Decimal
+
+
+def tile_url(z, x, y):
+    """
+    Return the URL of a tile
+    """
+    return reverse('servicearea:tile', args=[z, x, y])
+
+
+class TileRangeTests(TestCase):
+    """
+    Test the tiles covering an extent
+    """
+
+    def test_tile_range(self):
+        """
+        Test the tiles of each quadrant at zoom 1
+        """
+        self.assertEqual(tile_range(0, (-180, -90, 180, 90)), (0, 0, 0, 0))
+        self.assertEqual(tile_range(1, (1, 1, 2, 2)), (1, 0, 1, 0))
+        self.assertEqual(tile_range(1, (-2, -2, -1, -1)), (0, 1, 0, 1))
+        self.assertEqual(tile_range(1, (-1, -1, 1, 1)), (0, 0, 1, 1))
+
+
+class TileApiTests(TestCase):
+    """
+    Test the vector tile API
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com',
+            password='Testpass123',
+            name='Test Name',
+            phone_number='+123456789',
+            language='en',
+            currency='USD'
+        )
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service_area = ServiceArea.objects.create(
+                provider=self.user,
+                name='Test Service Area',
+                polygon=Polygon(((1, 1), (1, 2), (2, 2), (2, 1), (1, 1))),
+                price=Decimal('1.00'),
+                description='Test Service'
+            )
+
+    def test_login_required(self):
+        """
+        Test that login is required for the tiles
+        """
+        res = APIClient().get(tile_url(1, 1, 0))
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_tile(self):
+        """
+        Test the tiles hold the service areas they intersect
+        """
+        res = self.client.get(tile_url(1, 1, 0))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res['Content-Type'], 'application/vnd.mapbox-vector-tile'
+        )
+        self.assertIn(b'Test Service Area', res.content)
+
+        res = self.client.get(tile_url(1, 0, 1))
+        self.assertEqual(res.content, b'')
+
+    def test_tile_out_of_range(self):
+        """
+        Test tiles outside of the zoom level are not found
+        """
+        res = self.client.get(tile_url(1, 2, 0))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_tile_cached_until_change(self):
+        """
+        Test tiles are served from the cache until their areas change
+        """
+        url = tile_url(1, 1, 0)
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service_area.name = 'Renamed Service Area'
+            self.service_area.save()
+
+        res = self.client.get(url)
+        self.assertIn(b'Renamed Service Area', res.content)
+
+    def test_tile_invalidated_at_previous_extent(self):
+        """
+        Test moving a service area evicts the tiles it left
+        """
+        url = tile_url(1, 1, 0)
+        self.assertIn(b'Test Service Area', self.client.get(url).content)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service_area.polygon = Polygon(
+                ((-2, -2), (-2, -1), (-1, -1), (-1, -2), (-2, -2))
+            )
+            self.service_area.save()
+
+        self.assertEqual(self.client.get(url).content, b'')
+        self.assertIn(
+            b'Test Service Area', self.client.get(tile_url(1, 0, 1)).content
+        )
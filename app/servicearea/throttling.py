@@ -0,0 +1,194 @@
+"""
+Rate limiting and load shedding of the service area lookups
+"""
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from rest_framework import exceptions, status
+from rest_framework.authentication import get_authorization_header
+from rest_framework.throttling import BaseThrottle
+
+from user.authentication import LRUCache, token_cache
+
+
+# Seconds an idle bucket is kept in the process, longer than any bucket
+# takes to refill
+LOCAL_BUCKET_TTL = 3600
+
+
+class Overloaded(exceptions.APIException):
+    """
+    Too many lookups are running in the process
+    """
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many lookups in progress, try again later.'
+    default_code = 'overloaded'
+    wait = 1
+
+
+class BucketStore:
+    """
+    Token buckets kept in a local LRU or, when SERVICEAREA_THROTTLE_CACHE
+    is set, in that shared Django cache. Updates of a shared bucket
+    aren't atomic, so concurrent requests may get a few extra tokens.
+    """
+
+    def __init__(self):
+        self.local = LRUCache(
+            settings.SERVICEAREA_THROTTLE_SIZE, LOCAL_BUCKET_TTL
+        )
+
+    @property
+    def shared(self):
+        """Return the shared Django cache, if configured"""
+        if settings.SERVICEAREA_THROTTLE_CACHE:
+            return caches[settings.SERVICEAREA_THROTTLE_CACHE]
+        return None
+
+    def get(self, key):
+        """Return the (tokens, updated at) of the bucket, or None"""
+        if self.shared is not None:
+            return self.shared.get(key)
+        return self.local.get(key)
+
+    def set(self, key, bucket, timeout):
+        """Store the bucket, dropped after timeout seconds once full"""
+        if self.shared is not None:
+            self.shared.set(key, bucket, timeout)
+        else:
+            self.local.set(key, bucket)
+
+
+bucket_store = BucketStore()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket per provider, or per client address, and per endpoint:
+    SERVICEAREA_THROTTLE_BURST requests at once, refilled at
+    SERVICEAREA_THROTTLE_RATE requests per second.
+    The token is resolved from the token cache, before any authentication
+    query. Tokens not cached, made up ones included, share the bucket of
+    the client address.
+    """
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.wait_time = None
+
+    def get_cache_key(self, request):
+        """
+        Return the key of the bucket of the request
+        """
+        token = None
+        auth = get_authorization_header(request).split()
+        if len(auth) == 2 and auth[0].lower() == b'token':
+            try:
+                token = token_cache.get(auth[1].decode())
+            except UnicodeError:
+                pass
+        if token is not None:
+            ident = f'user:{token.user_id}'
+        else:
+            ident = 'ip:' + self.get_ident(request)
+        return f'throttle:{self.scope}:{ident}'
+
+    def allow_request(self, request, view):
+        """
+        Take a token from the bucket of the request, if there is one left
+        """
+        rate = settings.SERVICEAREA_THROTTLE_RATE
+        if not rate:
+            return True
+        burst = settings.SERVICEAREA_THROTTLE_BURST
+
+        key = self.get_cache_key(request)
+        now = time.time()
+        tokens, updated = bucket_store.get(key) or (burst, now)
+        tokens = min(burst, tokens + (now - updated) * rate)
+
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        else:
+            self.wait_time = (1 - tokens) / rate
+        bucket_store.set(
+            key, (tokens, now), math.ceil((burst - tokens) / rate) + 1
+        )
+        return allowed
+
+    def wait(self):
+        """
+        Return the seconds until the bucket holds a token again
+        """
+        return self.wait_time
+
+
+class InFlightLimiter:
+    """
+    Count of the lookups running in the process, bounded by
+    SERVICEAREA_MAX_IN_FLIGHT
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Count a lookup in, or return False if there are too many
+        """
+        limit = settings.SERVICEAREA_MAX_IN_FLIGHT
+        with self.lock:
+            if limit and self.count >= limit:
+                return False
+            self.count += 1
+            return True
+
+    def release(self):
+        """
+        Count a lookup out
+        """
+        with self.lock:
+            self.count -= 1
+
+
+in_flight = InFlightLimiter()
+
+
+class ThrottledLookupMixin:
+    """
+    API view mixin throttling the lookups and shedding them when too many
+    are running, before the request is authenticated or any query is run
+    """
+    throttle_scope = None
+    counted_in = False
+
+    def is_lookup(self):
+        """
+        Return whether the request is a lookup to protect
+        """
+        return True
+
+    def dispatch(self, request, *args, **kwargs):
+        # Count the lookup out whatever happens, unhandled errors included
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self.counted_in:
+                in_flight.release()
+                self.counted_in = False
+
+    def initial(self, request, *args, **kwargs):
+        if self.is_lookup():
+            throttle = TokenBucketThrottle(self.throttle_scope)
+            if not throttle.allow_request(request, self):
+                self.throttled(request, throttle.wait())
+            if not in_flight.acquire():
+                raise Overloaded()
+            self.counted_in = True
+        super().initial(request, *args, **kwargs)
@@ -0,0 +1,168 @@
+"""
+Mapbox Vector Tiles of the service areas and their cache
+"""
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from core.models import ServiceArea, ServiceAreaSimplified
+
+
+TILE_LAYER = 'service_areas'
+# Web Mercator only covers these latitudes
+MAX_LATITUDE = 85.0511287798
+
+
+def tile_exists(z, x, y):
+    """
+    Return whether (z, x, y) is a tile of the served zoom levels
+    """
+    return 0 <= z <= settings.SERVICEAREA_TILE_MAX_ZOOM \
+        and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def render_tile(z, x, y):
+    """
+    Return the tile of the service areas as MVT bytes
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH bounds AS (
+                SELECT ST_TileEnvelope(%(z)s, %(x)s, %(y)s) AS tile
+            ),
+            features AS (
+                SELECT
+                    ST_AsMVTGeom(
+                        ST_Transform(
+                            COALESCE(simplified.polygon, area.polygon), 3857
+                        ),
+                        bounds.tile
+                    ) AS geom,
+                    area.id,
+                    area.name,
+                    area.price::text AS price,
+                    area.provider_id
+                FROM bounds, {ServiceArea._meta.db_table} area
+                LEFT JOIN {ServiceAreaSimplified._meta.db_table} simplified
+                    ON simplified.service_area_id = area.id
+                    AND simplified.zoom = %(simplified_zoom)s
+                WHERE area.polygon && ST_Transform(bounds.tile, 4326)
+            )
+            SELECT ST_AsMVT(features, %(layer)s, 4096, 'geom')
+            FROM features
+            WHERE geom IS NOT NULL
+            """,
+            {
+                'z': z, 'x': x, 'y': y,
+                'simplified_zoom': ServiceAreaSimplified.zoom_within(
+                    ServiceAreaSimplified.tolerance(z)
+                ),
+                'layer': TILE_LAYER,
+            }
+        )
+        return bytes(cursor.fetchone()[0] or b'')
+
+
+def tile_range(z, extent):
+    """
+    Return the (min x, min y, max x, max y) tiles of zoom z covering the
+    (min lng, min lat, max lng, max lat) extent
+    """
+    def tile_x(lng):
+        return min(max(int((lng + 180) / 360 * 2 ** z), 0), 2 ** z - 1)
+
+    def tile_y(lat):
+        lat = math.radians(min(max(lat, -MAX_LATITUDE), MAX_LATITUDE))
+        y = (1 - math.asinh(math.tan(lat)) / math.pi) / 2 * 2 ** z
+        return min(max(int(y), 0), 2 ** z - 1)
+
+    min_lng, min_lat, max_lng, max_lat = extent
+    # Tile rows grow southwards
+    return tile_x(min_lng), tile_y(max_lat), tile_x(max_lng), tile_y(min_lat)
+
+
+def generation_key(z):
+    """
+    Return the cache key of the generation of the tiles of zoom z
+    """
+    return f'servicearea:tile-generation:{z}'
+
+
+def get_generation(z):
+    """
+    Return the current generation of the tiles of zoom z
+    """
+    generation = cache.get(generation_key(z))
+    if generation is None:
+        # Seed from the clock so a lost key never repeats an old generation
+        cache.add(generation_key(z), time.time_ns(), timeout=None)
+        generation = cache.get(generation_key(z))
+    return generation
+
+
+def bump_generation(z):
+    """
+    Mark every cached tile of zoom z as stale
+    """
+    try:
+        cache.incr(generation_key(z))
+    except ValueError:
+        cache.add(generation_key(z), time.time_ns(), timeout=None)
+
+
+def tile_cache_key(z, generation, x, y):
+    """
+    Return the cache key of the tile in a generation of its zoom level
+    """
+    return f'servicearea:tile:{z}:{generation}:{x}:{y}'
+
+
+def get_tile(z, x, y):
+    """
+    Return the tile from the cache, rendering and caching it on a miss
+    """
+    key = tile_cache_key(z, get_generation(z), x, y)
+    tile = cache.get(key)
+    if tile is None:
+        tile = render_tile(z, x, y)
+        cache.set(key, tile, settings.SERVICEAREA_TILE_CACHE_TIMEOUT)
+    return tile
+
+
+def invalidate_tiles(extents):
+    """
+    Evict the cached tiles intersecting any of the extents.
+    At zoom levels where they cover too many tiles, the whole level is
+    invalidated instead.
+    """
+    for z in range(settings.SERVICEAREA_TILE_MAX_ZOOM + 1):
+        generation = get_generation(z)
+        keys = set()
+        for extent in extents:
+            min_x, min_y, max_x, max_y = tile_range(z, extent)
+            count = (max_x - min_x + 1) * (max_y - min_y + 1)
+            if len(keys) + count > settings.SERVICEAREA_TILE_INVALIDATE_MAX:
+                keys = None
+                break
+            keys.update(
+                tile_cache_key(z, generation, x, y)
+                for x in range(min_x, max_x + 1)
+                for y in range(min_y, max_y + 1)
+            )
+
+        if keys is None:
+            bump_generation(z)
+        elif keys:
+            cache.delete_many(keys)
+
+
+def invalidate_all_tiles():
+    """
+    Evict every cached tile
+    """
+    for z in range(settings.SERVICEAREA_TILE_MAX_ZOOM + 1):
+        bump_generation(z)
@@ -6,7 +6,7 @@ from django.urls import path, include
 
 from rest_framework.routers import DefaultRouter
 
-from servicearea import views
+from servicearea import views, async_views
 
 
 router = DefaultRouter()
@@ -17,5 +17,16 @@ router.register('servicearea-detail', views.ServiceAreaUpdateViewSet)
 app_name = 'servicearea'
 
 urlpatterns = [
+    path('lookup/', async_views.lookup, name='lookup'),
+    path(
+        'lookup/batch/',
+        views.ServiceAreaBatchLookupView.as_view(),
+        name='lookup-batch'
+    ),
+    path(
+        'tiles/<int:z>/<int:x>/<int:y>.mvt',
+        views.ServiceAreaTileView.as_view(),
+        name='tile'
+    ),
     path('', include(router.urls)),
 ]
@@ -0,0 +1,35 @@
+"""
+Service area version counter shared by all workers
+"""
+import time
+
+from django.core.cache import cache
+
+from core.routers import remember_any_write
+
+
+VERSION_CACHE_KEY = 'servicearea:version'
+
+
+def get_version():
+    """
+    Return the current service area version
+    """
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        # Seed from the clock so a lost key never repeats an old version
+        cache.add(VERSION_CACHE_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_CACHE_KEY)
+    return version
+
+
+def bump_version():
+    """
+    Mark every cached view of the service areas as stale. Until the
+    replicas catch up, the views cached anew are read from the primary.
+    """
+    remember_any_write()
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.add(VERSION_CACHE_KEY, time.time_ns(), timeout=None)
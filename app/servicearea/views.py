@@ -1,20 +1,57 @@
 """
 Views for the service area APIs
 """
-from rest_framework import viewsets, mixins
+from rest_framework import viewsets, mixins, status, serializers
+from rest_framework.decorators import action
+from rest_framework.views import APIView
+from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.exceptions import APIException
-import json
+from rest_framework.renderers import BrowsableAPIRenderer
 
-from django.contrib.gis.geos import Point, Polygon
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
 
-from servicearea.serializers import ServiceAreaSerializer
+from user.authentication import CachedTokenAuthentication
 
+from servicearea.serializers import (
+    ServiceAreaSerializer,
+    GeometryQuerySerializer,
+    LookupQuerySerializer,
+    BatchLookupSerializer,
+    BulkServiceAreaSerializer
+)
+from servicearea.pagination import ServiceAreaCursorPagination
+from servicearea.queries import (
+    lookup_queryset,
+    lookup_results,
+    lookup_rows,
+    format_row,
+    lookup_points,
+    lookup_points_with_index
+)
+from servicearea.geometry import POLYGON_INPUT_KEYS, polygon_from_request
+from servicearea.renderers import ORJSONRenderer
+from servicearea.tiles import tile_exists, get_tile
+from servicearea.throttling import ThrottledLookupMixin
+from servicearea.response_cache import (
+    quantize,
+    lookup_cache_key,
+    etag_for,
+    etag_matches
+)
+
+from core.instrumentation import InstrumentedViewMixin, timer
+from core.routers import read_recent_writes
 from core.models import ServiceArea
 
 
-class ServiceAreaViewSet(mixins.ListModelMixin,
+class ServiceAreaViewSet(InstrumentedViewMixin,
+                         ThrottledLookupMixin,
+                         mixins.ListModelMixin,
                          mixins.CreateModelMixin,
                          viewsets.GenericViewSet):
     """
@@ -22,35 +59,53 @@ class ServiceAreaViewSet(mixins.ListModelMixin,
     """
     queryset = ServiceArea.objects.all()
     serializer_class = ServiceAreaSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    renderer_classes = (ORJSONRenderer, BrowsableAPIRenderer)
+    pagination_class = ServiceAreaCursorPagination
+    throttle_scope = 'lookup'
+
+    def is_lookup(self):
+        """
+        Only throttle the point lookups
+        """
+        return self.action == 'list'
+
+    def get_lookup_params(self):
+        """
+        Validate and return the point lookup query parameters
+        """
+        if not hasattr(self, '_lookup_params'):
+            serializer = LookupQuerySerializer(data=self.request.query_params)
+            serializer.is_valid(raise_exception=True)
+            params = serializer.validated_data
+
+            if settings.SERVICEAREA_RESPONSE_CACHE:
+                params['cell'], (params['latitude'], params['longitude']) = \
+                    quantize(params['latitude'], params['longitude'])
+
+            self._lookup_params = params
+        return self._lookup_params
 
     def get_queryset(self):
         """
         Filter the queryset based on the user
         """
+        return lookup_queryset(self.get_lookup_params())
 
-        longitude = float(self.request.query_params.get('longitude'))
-        latitude = float(self.request.query_params.get('latitude'))
-        point = Point(longitude, latitude)
-
-        return ServiceArea.objects.filter(polygon__contains=point)
+    def get_serializer(self, *args, **kwargs):
+        """
+        Only serialize the requested fields when listing
+        """
+        if self.action == 'list':
+            kwargs['fields'] = self.get_lookup_params()['fields']
+        return super().get_serializer(*args, **kwargs)
 
     def perform_create(self, serializer):
         """
         This text is the description for this API.
         """
-
-        try:
-            polygon = self.request.data.getlist('polygon')
-            polygon = [json.loads(i.replace("'", "\"")) for i in polygon]
-        except Exception:
-            polygon = self.request.data['polygon']
-
-        try:
-            polygon = Polygon([(float(i['lat']), float(i['lng'])) for i in polygon])
-        except Exception:
-            raise APIException("Polygon is not valid")
+        polygon = polygon_from_request(self.request)
 
         serializer.save(provider=self.request.user, polygon=polygon)
 
@@ -58,6 +113,11 @@ class ServiceAreaViewSet(mixins.ListModelMixin,
         """
         Create a new service area.
         ---
+        The polygon is sent in one of:
+            - polygon: GeoJSON Polygon geometry, in longitude/latitude
+            - polyline: encoded polyline of the exterior ring
+            - wkb: base64 encoded WKB or EWKB, in longitude/latitude
+            - polygon: list of {"lat", "lng"} vertices, as below
         Polygon body example:
                 "polygon": [
                     {"lat": "-2", "lng": "0"},
@@ -69,6 +129,20 @@ class ServiceAreaViewSet(mixins.ListModelMixin,
         """
         return super(ServiceAreaViewSet, self).create(request, *args, **kwargs)
 
+    def list_rows(self):
+        """
+        Return the page of service areas built from plain rows, skipping
+        model instances and the serializer on the hot lookup path
+        """
+        params = self.get_lookup_params()
+        results = lookup_results(params, self.paginate_queryset)
+        if params.get('nearest') is not None:
+            # The nearest service areas always fit in a single page
+            return Response(
+                {'next': None, 'previous': None, 'results': results}
+            )
+        return self.get_paginated_response(results)
+
     def list(self, request, *args, **kwargs):
         """
         List all service areas.
@@ -76,11 +150,61 @@ class ServiceAreaViewSet(mixins.ListModelMixin,
         Query parameters:
             - latitude
             - longitude
+            - fields: comma separated fields to return
+              (default: id,name,price,provider)
+            - include: comma separated fields to add to the defaults,
+              e.g. include=polygon
+            - order_by: price (default) or -price
+            - min_price, max_price: price range of the service areas
+            - provider: id of the provider of the service areas
+            - currency, language: currency and language of the provider
+            - limit: number of service areas per page
+            - cursor: cursor of the page, taken from `next`/`previous`
+            - precision: decimal digits of the GeoJSON polygon coordinates
+            - simplify: tolerance in degrees of the simplified polygons
+            - zoom: web map zoom level the polygons are simplified for
+            - nearest: return this many service areas closest to the point
+              instead, containing it or not, with their `distance` in
+              meters, closest first
+            - radius: maximum distance in meters of the nearest service
+              areas
         """
-        return super(ServiceAreaViewSet, self).list(request, *args, **kwargs)
+        if not settings.SERVICEAREA_RESPONSE_CACHE:
+            return self.list_rows()
+
+        cache_key = lookup_cache_key(
+            self.get_lookup_params()['cell'], request.query_params
+        )
+        etag = etag_for(cache_key)
+        if etag_matches(etag, request.headers.get('If-None-Match')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            data = cache.get(cache_key)
+            if data is None:
+                # Never cache what a lagging replica returns under the
+                # version of a newer write
+                read_recent_writes()
+                response = self.list_rows()
+                cache.set(
+                    cache_key,
+                    response.data,
+                    settings.SERVICEAREA_RESPONSE_CACHE_TIMEOUT
+                )
+            else:
+                response = Response(data)
+
+        response['ETag'] = etag
+        patch_cache_control(
+            response,
+            private=True,
+            max_age=settings.SERVICEAREA_RESPONSE_CACHE_MAX_AGE
+        )
+        return response
 
 
-class ServiceAreaUpdateViewSet(mixins.UpdateModelMixin,
+class ServiceAreaUpdateViewSet(InstrumentedViewMixin,
+                               mixins.RetrieveModelMixin,
+                               mixins.UpdateModelMixin,
                                mixins.DestroyModelMixin,
                                viewsets.GenericViewSet):
     """
@@ -88,8 +212,9 @@ class ServiceAreaUpdateViewSet(mixins.UpdateModelMixin,
     """
     queryset = ServiceArea.objects.all()
     serializer_class = ServiceAreaSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    renderer_classes = (ORJSONRenderer, BrowsableAPIRenderer)
 
     def get_queryset(self):
         """
@@ -97,21 +222,189 @@ class ServiceAreaUpdateViewSet(mixins.UpdateModelMixin,
         """
         return ServiceArea.objects.filter(provider=self.request.user)
 
-    def perform_update(self, serializer):
+    def retrieve(self, request, *args, **kwargs):
         """
-        Create a new service area
+        Retrieve a service area.
+        ---
+        Query parameters:
+            - simplify: tolerance in degrees of the simplified polygon
+            - zoom: web map zoom level the polygon is simplified for
+            - precision: decimal digits of the GeoJSON polygon coordinates
         """
+        serializer = GeometryQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        fields = ServiceAreaSerializer.Meta.fields
+        params = {**serializer.validated_data, 'fields': fields}
 
-        try:
-            polygon = self.request.data.getlist('polygon')
-            polygon = [json.loads(i.replace("'", "\"")) for i in polygon]
+        row = get_object_or_404(
+            lookup_rows(self.get_queryset(), params),
+            pk=kwargs[self.lookup_field]
+        )
+        return Response(format_row(row, fields))
 
-        except Exception:
-            polygon = self.request.data['polygon']
+    def perform_update(self, serializer):
+        """
+        Update a service area, keeping its polygon unless a new one is sent
+        """
+        if not any(key in self.request.data for key in POLYGON_INPUT_KEYS):
+            serializer.save(provider=self.request.user)
+            return
 
-        try:
-            polygon = Polygon([(float(i['lat']), float(i['lng'])) for i in polygon])
-        except Exception:
-            raise APIException("Polygon is not valid")
+        polygon = polygon_from_request(self.request)
 
         serializer.save(provider=self.request.user, polygon=polygon)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request, *args, **kwargs):
+        """
+        Create, update and delete many service areas in one transaction.
+        ---
+        Body example:
+            "create": [{"name": "A", "price": "1.00", "polygon": [...]}],
+            "update": [{"id": 1, "price": "2.00"}],
+            "delete": [2, 3]
+        """
+        serializer = BulkServiceAreaSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        with transaction.atomic():
+            queryset = self.get_queryset()
+            service_areas = queryset.select_for_update().in_bulk(
+                [item['id'] for item in data['update']] + data['delete']
+            )
+
+            errors = {}
+            for operation, ids in (
+                ('update', [item['id'] for item in data['update']]),
+                ('delete', data['delete']),
+            ):
+                for index, pk in enumerate(ids):
+                    if pk not in service_areas:
+                        errors.setdefault(operation, {})[index] = {
+                            'id': 'Not found.'
+                        }
+            if errors:
+                raise serializers.ValidationError(errors)
+
+            created = ServiceArea.objects.bulk_create_areas([
+                ServiceArea(provider=request.user, **item)
+                for item in data['create']
+            ])
+
+            updated = []
+            updated_fields = set()
+            for item in data['update']:
+                service_area = service_areas[item['id']]
+                for field, value in item.items():
+                    if field != 'id':
+                        setattr(service_area, field, value)
+                        updated_fields.add(field)
+                updated.append(service_area)
+            if updated and updated_fields:
+                ServiceArea.objects.bulk_update_areas(updated, updated_fields)
+
+            queryset.filter(id__in=data['delete']).delete()
+
+        return Response({
+            'create': [
+                {'id': service_area.id, 'status': 'created'}
+                for service_area in created
+            ],
+            'update': [
+                {'id': item['id'], 'status': 'updated'}
+                for item in data['update']
+            ],
+            'delete': [
+                {'id': pk, 'status': 'deleted'} for pk in data['delete']
+            ],
+        })
+
+
+class ServiceAreaBatchLookupView(InstrumentedViewMixin,
+                                 ThrottledLookupMixin,
+                                 APIView):
+    """
+    API endpoint that resolves the service areas of many points at once.
+    """
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    renderer_classes = (ORJSONRenderer, BrowsableAPIRenderer)
+    throttle_scope = 'batch'
+
+    def post(self, request, *args, **kwargs):
+        """
+        List the service areas containing each point.
+        ---
+        Body example:
+            "points": [
+                {"latitude": 0.5, "longitude": 0.5},
+                {"latitude": 1.5, "longitude": -0.5}
+            ]
+        """
+        serializer = BatchLookupSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        points = serializer.validated_data['points']
+
+        coordinates = [(p['longitude'], p['latitude']) for p in points]
+        if settings.SERVICEAREA_SPATIAL_INDEX:
+            matches = lookup_points_with_index(coordinates)
+        else:
+            matches = lookup_points(coordinates)
+
+        with timer('serialize'):
+            results = [
+                {
+                    'latitude': point['latitude'],
+                    'longitude': point['longitude'],
+                    'service_areas': [
+                        {
+                            'id': pk,
+                            'price': str(price),
+                            'provider': provider_id
+                        }
+                        for pk, price, provider_id in point_matches
+                    ],
+                }
+                for point, point_matches in zip(points, matches)
+            ]
+        return Response({'results': results})
+
+
+class ServiceAreaTileView(InstrumentedViewMixin,
+                          ThrottledLookupMixin,
+                          APIView):
+    """
+    API endpoint serving the service areas as Mapbox Vector Tiles.
+    """
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    renderer_classes = (ORJSONRenderer,)
+    throttle_scope = 'tiles'
+
+    def perform_content_negotiation(self, request, force=False):
+        """
+        Accept the tile media types map clients ask for, errors being
+        rendered as JSON
+        """
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, z, x, y, *args, **kwargs):
+        """
+        Return the {z}/{x}/{y} tile of every service area, in a
+        `service_areas` layer with the id, name, price and provider_id
+        of each area.
+        """
+        if not tile_exists(z, x, y):
+            raise Http404
+
+        response = HttpResponse(
+            get_tile(z, x, y),
+            content_type='application/vnd.mapbox-vector-tile'
+        )
+        patch_cache_control(
+            response,
+            private=True,
+            max_age=settings.SERVICEAREA_TILE_MAX_AGE
+        )
+        return response
@@ -0,0 +1,163 @@
+"""
+Authentication classes for the APIs.
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from core.routers import read_own_writes
+
+
+class LRUCache:
+    """Thread safe least recently used cache whose entries expire"""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value or None if missing or expired"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """Cache the value, evicting the least recently used if full"""
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        """Remove the value from the cache"""
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        """Remove every value from the cache"""
+        with self.lock:
+            self.entries.clear()
+
+
+# Fields of the user kept in the token cache, the others (password hash
+# included) are deferred and loaded on access
+CACHED_USER_FIELDS = ('id', 'email', 'name', 'is_active', 'is_staff')
+
+
+class TokenCache:
+    """
+    Cache of token key -> Token (with its user) kept in a local LRU and,
+    when TOKEN_CACHE_ALIAS is set, in that shared Django cache. Neither
+    the token key nor the password hash are cached. Every request gets
+    its own copy, so changes to request.user never leak into the cache or
+    other requests.
+    """
+
+    def __init__(self):
+        self.local = LRUCache(
+            settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_TTL
+        )
+
+    @property
+    def shared(self):
+        """Return the shared Django cache, if configured"""
+        if settings.TOKEN_CACHE_ALIAS:
+            return caches[settings.TOKEN_CACHE_ALIAS]
+        return None
+
+    @staticmethod
+    def strip(token):
+        """
+        Return a copy of the token without its key, and with a user only
+        holding CACHED_USER_FIELDS
+        """
+        user = token.user
+        stripped = copy.copy(token)
+        stripped.key = ''
+        stripped.user = type(user).from_db(
+            user._state.db,
+            CACHED_USER_FIELDS,
+            [getattr(user, field) for field in CACHED_USER_FIELDS]
+        )
+        return stripped
+
+    @staticmethod
+    def isolate(token, key):
+        """Return a copy of the cached token and of its user"""
+        token = copy.copy(token)
+        token.key = key
+        token.user = copy.copy(token.user)
+        return token
+
+    @staticmethod
+    def cache_key(key):
+        """Return the shared cache key, so raw tokens are never stored"""
+        return 'auth-token:' + hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, key):
+        """Return the cached token or None"""
+        token = self.local.get(key)
+        if token is None and self.shared is not None:
+            token = self.shared.get(self.cache_key(key))
+            if token is not None:
+                self.local.set(key, token)
+        if token is None:
+            return None
+        return self.isolate(token, key)
+
+    def set(self, key, token):
+        """Cache the token"""
+        token = self.strip(token)
+        self.local.set(key, token)
+        if self.shared is not None:
+            self.shared.set(
+                self.cache_key(key), token, settings.TOKEN_CACHE_TTL
+            )
+
+    def delete(self, key):
+        """Evict the token"""
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(self.cache_key(key))
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that resolves known tokens without a query.
+    Entries are evicted when the token is deleted or its user is saved;
+    workers not sharing a cache see the change after TOKEN_CACHE_TTL.
+    Providers who wrote recently read from the primary database.
+    """
+
+    def authenticate_credentials(self, key):
+        """Resolve the token from the cache, falling back to the database"""
+        token = token_cache.get(key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, token)
+        elif not token.user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+
+        read_own_writes(token.user_id)
+        return (token.user, token)
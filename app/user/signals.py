@@ -0,0 +1,39 @@
+"""
+Signals for the user app.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from core.routers import remember_write
+
+from user.authentication import token_cache
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    """Evict a deleted token from the cache"""
+    transaction.on_commit(lambda: token_cache.delete(instance.key))
+
+
+@receiver(post_save, sender=get_user_model())
+def provider_saved(sender, instance, **kwargs):
+    """
+    Evict the tokens of an updated or deactivated provider, and have them
+    read from the primary for a while
+    """
+    transaction.on_commit(lambda: remember_write(instance.pk))
+    keys = list(
+        Token.objects.filter(user_id=instance.pk)
+        .values_list('key', flat=True)
+    )
+
+    def evict():
+        for key in keys:
+            token_cache.delete(key)
+
+    if keys:
+        transaction.on_commit(evict)
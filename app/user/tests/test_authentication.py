@@ -0,0 +1,104 @@
+"""
+Test for the cached token authentication
+"""
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+
+from user.authentication import (
+    CachedTokenAuthentication,
+    TokenCache,
+    token_cache
+)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test resolving tokens through the cache"""
+
+    def setUp(self):
+        token_cache.local.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com',
+            password='testpass',
+            name='Test name',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.authentication = CachedTokenAuthentication()
+
+    def test_cached_token_skips_database(self):
+        """Test a token is only looked up in the database once"""
+        with self.assertNumQueries(1):
+            user, token = self.authentication.authenticate_credentials(
+                self.token.key
+            )
+        self.assertEqual(user, self.user)
+
+        with self.assertNumQueries(0):
+            user, token = self.authentication.authenticate_credentials(
+                self.token.key
+            )
+        self.assertEqual(user, self.user)
+        self.assertEqual(token.key, self.token.key)
+
+    def test_cached_user_not_shared(self):
+        """Test changing the user of a request doesn't change the cache"""
+        user, token = self.authentication.authenticate_credentials(
+            self.token.key
+        )
+        user.name = 'Changed'
+
+        user, token = self.authentication.authenticate_credentials(
+            self.token.key
+        )
+        self.assertEqual(user.name, 'Test name')
+        user.name = 'Changed'
+
+        user, token = self.authentication.authenticate_credentials(
+            self.token.key
+        )
+        self.assertEqual(user.name, 'Test name')
+
+    @override_settings(TOKEN_CACHE_ALIAS='default')
+    def test_no_credentials_cached(self):
+        """Test neither the token nor the password hash are cached"""
+        self.addCleanup(caches['default'].clear)
+        self.authentication.authenticate_credentials(self.token.key)
+
+        cached = caches['default'].get(TokenCache.cache_key(self.token.key))
+        self.assertEqual(cached.key, '')
+        self.assertEqual(cached.user_id, self.user.id)
+        self.assertNotIn('password', cached.user.__dict__)
+        local = token_cache.local.get(self.token.key)
+        self.assertNotIn('password', local.user.__dict__)
+
+        token_cache.local.clear()
+        with self.assertNumQueries(0):
+            user, token = self.authentication.authenticate_credentials(
+                self.token.key
+            )
+        self.assertEqual(token.key, self.token.key)
+        self.assertEqual(user.email, self.user.email)
+
+    def test_deactivated_user_evicted(self):
+        """Test deactivating a user stops its cached token from working"""
+        self.authentication.authenticate_credentials(self.token.key)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authentication.authenticate_credentials(self.token.key)
+
+    def test_deleted_token_evicted(self):
+        """Test deleting a token stops it from working"""
+        self.authentication.authenticate_credentials(self.token.key)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authentication.authenticate_credentials(self.token.key)
@@ -1,13 +1,17 @@
 """
 Test for the user API
 """
-from django.test import TestCase
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core.hashers import Argon2PasswordHasher, hashing_limiter
+
 
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
@@ -72,6 +76,67 @@ class PublicUserApiTests(TestCase):
         self.assertIn('token', res.data)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
+    def test_create_token_reuses_valid_token(self):
+        """Test a valid token sent along is returned without rehashing"""
+        create_user(**self.payload_create)
+        token = self.client.post(TOKEN_URL, self.payload_create).data['token']
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        with patch.object(Argon2PasswordHasher, 'verify') as verify:
+            res = self.client.post(TOKEN_URL, {
+                'email': self.payload_create['email'],
+                'password': 'whatever',
+            })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['token'], token)
+        verify.assert_not_called()
+
+        res = self.client.post(TOKEN_URL, {
+            'email': 'other@api.com',
+            'password': 'whatever',
+        })
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_token_rehashes_password(self):
+        """Test a password hashed with another hasher is rehashed on login"""
+        user = create_user(**self.payload_create)
+        with self.settings(PASSWORD_HASHERS=[
+            'core.hashers.PBKDF2PasswordHasher'
+        ]):
+            user.set_password(self.payload_create['password'])
+            user.save()
+
+        res = self.client.post(TOKEN_URL, self.payload_create)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('argon2$'))
+
+    @override_settings(PASSWORD_HASHING_CONCURRENCY=1)
+    def test_create_token_hashing_busy(self):
+        """Test logins get a 503 past the hashes running at once"""
+        create_user(**self.payload_create)
+        slots = hashing_limiter.get_slots()
+        slots.acquire()
+        self.addCleanup(slots.release)
+
+        res = self.client.post(TOKEN_URL, self.payload_create)
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res['Retry-After'], '1')
+
+    @override_settings(PASSWORD_HASHING_CONCURRENCY=1)
+    def test_create_token_hashing_limited(self):
+        """Test logins below the limit hash in the request thread"""
+        create_user(**self.payload_create)
+
+        res = self.client.post(TOKEN_URL, self.payload_create)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(hashing_limiter.get_slots().acquire(False))
+        hashing_limiter.get_slots().release()
+
     def test_create_token_invalid_credentials(self):
         """Test that token is not created if invalid credentials are given"""
         create_user(**self.payload_create)
@@ -155,6 +220,31 @@ class PrivateUserApiTests(TestCase):
         self.assertTrue(self.user.check_password(payload['password']))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
+    @override_settings(PASSWORD_HASHING_CONCURRENCY=1)
+    def test_update_user_profile_hashing_busy(self):
+        """Test a 503 on the password leaves the whole profile unchanged"""
+        slots = hashing_limiter.get_slots()
+        slots.acquire()
+        try:
+            res = self.client.patch(
+                ME_URL, {'name': 'new name', 'password': 'newpassword123'}
+            )
+        finally:
+            slots.release()
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.name, 'Test name')
+        self.assertTrue(self.user.check_password('testpass'))
+
+    def test_update_user_profile_fresh_object(self):
+        """Test updating the profile doesn't change the request user"""
+        res = self.client.patch(ME_URL, {'name': 'new name'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['name'], 'new name')
+        self.assertEqual(self.user.name, 'Test name')
+
     def test_delete_user_profile(self):
         """Test deleting the user profile for authenticated user"""
         res = self.client.delete(ME_URL)
@@ -1,41 +1,108 @@
 """
 Views for the user API.
 """
-from rest_framework import generics, authentication, permissions
+import math
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+
+from rest_framework import generics, permissions, exceptions, status
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
+from core.hashers import HashingBusy
+
+from user.authentication import CachedTokenAuthentication
 from user.serializers import (
     UserSerializer,
     AuthTokenSerializer
 )
 
 
-class UserCreateView(generics.CreateAPIView):
+class HashingUnavailable(exceptions.APIException):
+    """
+    Too many passwords are being hashed
+    """
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many password checks, try again later.'
+    default_code = 'hashing_busy'
+
+
+class HashingViewMixin:
+    """
+    Answer 503 with a Retry-After when too many passwords are being hashed
+    """
+
+    def handle_exception(self, exc):
+        if not isinstance(exc, HashingBusy):
+            return super().handle_exception(exc)
+        response = super().handle_exception(HashingUnavailable())
+        response['Retry-After'] = str(
+            max(math.ceil(settings.PASSWORD_HASHING_TIMEOUT), 1)
+        )
+        return response
+
+
+class UserCreateView(HashingViewMixin, generics.CreateAPIView):
     """
     Endpoint to create user.
     """
     serializer_class = UserSerializer
 
 
-class CreateTokenView(ObtainAuthToken):
+class CreateTokenView(HashingViewMixin, ObtainAuthToken):
     """
     Endpoint to create a new auth token.
     """
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
     serializer_class = AuthTokenSerializer
 
+    @staticmethod
+    def current_token(request):
+        """
+        Return the valid token sent in the Authorization header if it
+        belongs to the posted email, or None
+        """
+        try:
+            credentials = CachedTokenAuthentication().authenticate(request)
+        except exceptions.AuthenticationFailed:
+            return None
+        if credentials is None:
+            return None
+        user, token = credentials
+        if user.email.lower() != str(request.data.get('email', '')).lower():
+            return None
+        return token
+
+    def post(self, request, *args, **kwargs):
+        """
+        Return the token of the provider. A client already holding a valid
+        token gets it back without its password being hashed again.
+        """
+        token = self.current_token(request)
+        if token is not None:
+            return Response({'token': token.key})
+        return super().post(request, *args, **kwargs)
+
 
-class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
+class ManageUserView(HashingViewMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Endpoint to manage the authenticated user.
     """
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
         """
-        Retrieve and return authenticated user.
+        Retrieve and return authenticated user, fresh from the primary so
+        a failed update never leaves request.user half changed.
         """
-        return self.request.user
+        user = generics.get_object_or_404(
+            get_user_model().objects.using(DEFAULT_DB_ALIAS),
+            pk=self.request.user.pk
+        )
+        self.check_object_permissions(self.request, user)
+        return user